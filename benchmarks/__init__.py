@@ -0,0 +1,5 @@
+"""Benchmarks for the browser pipeline, run headless with a stub font backend
+
+    python -m benchmarks.run --out results.json
+    python -m benchmarks.compare baseline.json results.json
+"""
@@ -0,0 +1,55 @@
+"""Compare two benchmark result files and flag regressions
+
+    python -m benchmarks.compare baseline.json results.json --threshold 0.1
+
+Exits with status 1 when any phase got slower by more than the threshold,
+so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline, results, threshold=0.1, statistic="median"):
+    """compare the phases of two runs
+
+    Returns:
+        list: (phase, baseline seconds, new seconds, ratio, regressed) for
+            every phase present in both runs
+    """
+    rows = []
+    for name, phase in results["phases"].items():
+        if name not in baseline["phases"]:
+            continue
+        before = baseline["phases"][name][statistic]
+        after = phase[statistic]
+        ratio = after / before if before else float("inf")
+        rows.append((name, before, after, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    args.add_argument("baseline")
+    args.add_argument("results")
+    args.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown, 0.1 is 10%%")
+    args.add_argument("--statistic", choices=["best", "median"], default="median")
+    options = args.parse_args()
+    with open(options.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(options.results, encoding="utf-8") as file:
+        results = json.load(file)
+    if baseline["config"] != results["config"]:
+        print("warning: the runs used different configurations", file=sys.stderr)
+
+    rows = compare(baseline, results, options.threshold, options.statistic)
+    print(f"{'phase':<24}{'before ms':>12}{'after ms':>12}{'ratio':>8}")
+    for name, before, after, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<24}{before * 1000:>12.1f}{after * 1000:>12.1f}{ratio:>8.2f}{flag}")
+    if any(row[-1] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
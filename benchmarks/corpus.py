@@ -0,0 +1,95 @@
+"""A seeded generator for large synthetic HTML documents and stylesheets
+
+    The same seed and parameters always produce the same document, so
+    timings from different commits are comparable.
+"""
+from dataclasses import asdict, dataclass
+import random
+
+BLOCK_TAGS = ["div", "section", "article", "p", "ul", "li", "blockquote", "header", "footer"]
+INLINE_TAGS = ["b", "i", "a", "span", "small", "big", "em"]
+PROPERTIES = {
+    "color": ["black", "red", "blue", "green", "gray"],
+    "background-color": ["white", "lightgray", "yellow", "transparent"],
+    "font-size": ["90%", "110%", "12px", "16px", "20px"],
+    "font-weight": ["normal", "bold"],
+    "font-style": ["normal", "italic"],
+}
+
+
+@dataclass
+class CorpusConfig:
+    """parameters of a generated document
+
+    seed: random seed
+    depth: nesting depth of block elements
+    breadth: number of children of every block element
+    words: number of words in every run of text
+    rules: number of rules in the stylesheet
+    descendant_density: fraction of rules that use a descendant selector
+    vocabulary: number of distinct words
+    """
+
+    seed: int = 0
+    depth: int = 4
+    breadth: int = 5
+    words: int = 40
+    rules: int = 200
+    descendant_density: float = 0.5
+    vocabulary: int = 5000
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def vocabulary(rng, size):
+    """random words with a natural looking spread of lengths"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choices(letters, k=rng.randint(1, 12))) for _ in range(size)]
+
+
+def generate_html(config):
+    """generate a document of nested blocks, paragraphs and inline markup"""
+    rng = random.Random(config.seed)
+    words = vocabulary(rng, config.vocabulary)
+    parts = []
+
+    def text():
+        run = rng.choices(words, k=config.words)
+        # wrap a few words in inline elements
+        for _ in range(max(1, config.words // 10)):
+            i = rng.randrange(len(run))
+            tag = rng.choice(INLINE_TAGS)
+            run[i] = f"<{tag}>{run[i]}</{tag}>"
+        return " ".join(run)
+
+    def block(depth):
+        if depth == 0:
+            parts.append(f"<p>{text()}</p>")
+            return
+        tag = rng.choice(BLOCK_TAGS)
+        parts.append(f"<{tag}>")
+        for _ in range(config.breadth):
+            block(depth - 1)
+        parts.append(f"</{tag}>")
+
+    parts.append('<html><head><link rel="stylesheet" href="style.css"></head><body>')
+    block(config.depth)
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def generate_css(config):
+    """generate a stylesheet with a mix of tag and descendant selectors"""
+    rng = random.Random(config.seed + 1)
+    tags = BLOCK_TAGS + INLINE_TAGS
+    rules = []
+    for _ in range(config.rules):
+        selector = rng.choice(tags)
+        if rng.random() < config.descendant_density:
+            ancestors = rng.choices(BLOCK_TAGS, k=rng.randint(1, 3))
+            selector = " ".join(ancestors + [selector])
+        props = rng.sample(list(PROPERTIES), k=rng.randint(1, 3))
+        body = " ".join(f"{prop}: {rng.choice(PROPERTIES[prop])};" for prop in props)
+        rules.append(f"{selector} {{ {body} }}")
+    return "\n".join(rules)
@@ -0,0 +1,58 @@
+"""Compare the peak memory of painting into the packed DisplayList with the
+old representation, where every word existed as a (x, y, word, font, color)
+tuple in its BlockLayout and again as a DrawText object.
+
+    python -m benchmarks.display_list --paragraphs 500 --words 300
+"""
+import argparse
+import tracemalloc
+
+from src.css import INHERITED_PROPERTIES
+from src.display_list import DisplayList
+from src.dom import HTMLParser
+from src.layout import DocumentLayout, DrawText
+from src.tree_utils import tree_to_list
+
+from .fonts import StubBrowser
+from .line_breaking import paragraphs
+
+
+def peak(func):
+    tracemalloc.start()
+    result = func()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak_bytes
+
+
+def main():
+    args = argparse.ArgumentParser()
+    args.add_argument("--paragraphs", type=int, default=500)
+    args.add_argument("--words", type=int, default=300)
+    args = args.parse_args()
+
+    nodes = HTMLParser(f"<html><body>{paragraphs(args.paragraphs, args.words)}</body></html>").parse()
+    for node in tree_to_list(nodes, []):
+        node.style = dict(INHERITED_PROPERTIES)
+    document = DocumentLayout(nodes, StubBrowser(800))
+    document.layout()
+
+    def packed():
+        display_list = DisplayList()
+        document.paint(display_list)
+        return display_list
+
+    display_list, packed_bytes = peak(packed)
+
+    def objects():
+        tuples = [(cmd.left, cmd.top, cmd.text, cmd.font, cmd.color) for cmd in display_list]
+        return tuples, [DrawText(*item, bottom=item[1] + 16) for item in tuples]
+
+    _, object_bytes = peak(objects)
+    print(f"{len(display_list)} commands")
+    print(f"tuples + DrawText objects: {object_bytes / 2**20:8.1f}MiB")
+    print(f"packed DisplayList:        {packed_bytes / 2**20:8.1f}MiB")
+
+
+if __name__ == "__main__":
+    main()
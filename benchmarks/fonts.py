@@ -0,0 +1,45 @@
+"""A stub font backend so layout and paint can run without a display"""
+from src.layout_cache import LayoutCache
+from src.window import WebFont
+
+
+class StubFont:
+    """stands in for a tkinter font, every character is 0.6em wide"""
+
+    def __init__(self, size=12) -> None:
+        self.size = size
+
+    def measure(self, text):
+        return int(len(text) * self.size * 0.6)
+
+    def metrics(self, option=None):
+        metrics = {
+            "ascent": self.size,
+            "descent": self.size // 4 + 1,
+            "linespace": self.size + self.size // 4 + 1,
+        }
+        return metrics[option] if option else metrics
+
+
+class StubBrowser:
+    """the parts of Browser that layout uses, with stub fonts"""
+
+    def __init__(self, width=800, height=600) -> None:
+        self.width = width
+        self.height = height
+        self.fonts = {}
+        self.layout_cache = LayoutCache()
+
+    def get_font(self, family, size, weight, slant):
+        key = (family, size, weight, slant)
+        if key not in self.fonts:
+            font = StubFont(size + 1 if weight == "bold" else size)
+            metrics = font.metrics()
+            self.fonts[key] = WebFont(
+                font,
+                whitespace=font.measure(" "),
+                ascent=metrics["ascent"],
+                descent=metrics["descent"],
+                linespace=metrics["linespace"],
+            )
+        return self.fonts[key]
@@ -0,0 +1,103 @@
+"""Benchmark batched line breaking against the old word at a time loop
+on a paragraph heavy page
+
+    python -m benchmarks.line_breaking --paragraphs 200 --words 300
+"""
+import argparse
+import random
+import time
+
+from src import line_break
+from src.css import INHERITED_PROPERTIES
+from src.dom import HTMLParser
+from src.layout import BlockLayout, DocumentLayout
+from src.tree_utils import tree_to_list
+
+from .fonts import StubBrowser
+
+
+def word_at_a_time(words, width):
+    """the line breaking loop BlockLayout.text and flush used to run"""
+    display_list, line, cursor_x, cursor_y = [], [], 0, 0
+
+    def flush():
+        nonlocal line, cursor_x, cursor_y
+        if not line:
+            return
+        baseline = cursor_y + 1.25 * max(words.ascents[i] for _, i in line)
+        for x, i in line:
+            display_list.append(
+                (x, baseline - words.ascents[i], words.words[i], words.fonts[i], words.colors[i])
+            )
+        cursor_y = baseline + 1.25 * max(words.descents[i] for _, i in line)
+        line, cursor_x = [], 0
+
+    for i, (w, space) in enumerate(zip(words.widths, words.spaces)):
+        if cursor_x + w > width:
+            flush()
+        line.append((cursor_x, i))
+        cursor_x += w + space
+    flush()
+    return display_list
+
+
+def paragraphs(count, words, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices("abcdefghijklmnop", k=rng.randint(1, 12)))
+                  for _ in range(2000)]
+    return "".join(
+        "<p>" + " ".join(rng.choices(vocabulary, k=words)) + "</p>" for _ in range(count)
+    )
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    args = argparse.ArgumentParser()
+    args.add_argument("--paragraphs", type=int, default=200)
+    args.add_argument("--words", type=int, default=300)
+    args.add_argument("--repeat", type=int, default=5)
+    args = args.parse_args()
+
+    nodes = HTMLParser(f"<html><body>{paragraphs(args.paragraphs, args.words)}</body></html>").parse()
+    for node in tree_to_list(nodes, []):
+        node.style = dict(INHERITED_PROPERTIES)
+    browser = StubBrowser(800)
+    document = DocumentLayout(nodes, browser)
+    document.layout()
+    blocks = [block for block in tree_to_list(document, [])
+              if isinstance(block, BlockLayout) and block.words is not None]
+    widths = range(400, 800, 40)
+
+    def old():
+        for width in widths:
+            for block in blocks:
+                word_at_a_time(block.words, width)
+
+    def batched():
+        for width in widths:
+            for block in blocks:
+                words = block.words
+                line_break.break_lines(words.offsets, words.right_edges, width)
+
+    def relayout():
+        for width in widths:
+            browser.width = width
+            for block in blocks:
+                block.line_cache.clear()
+            document.layout()
+
+    print(f"{len(blocks)} paragraphs, {args.words} words each, {len(widths)} widths")
+    print(f"word at a time loop: {timed(old, args.repeat) * 1000:8.1f}ms")
+    print(f"batched:             {timed(batched, args.repeat) * 1000:8.1f}ms")
+    print(f"full relayout:       {timed(relayout, args.repeat) * 1000:8.1f}ms")
+
+if __name__ == "__main__":
+    main()
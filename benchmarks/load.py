@@ -0,0 +1,105 @@
+"""Load test src.connection.request against the loopback server
+
+    python -m benchmarks.load --size 100000 --latency 0.01 --concurrency 8 --requests 200
+    python -m benchmarks.load --tls --bandwidth 5000000 --out load.json
+
+Reports latency percentiles, throughput and errors, e.g. responses the
+client cannot handle yet such as --mode chunked or gzip.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+
+from src.connection import parse_url, request
+
+from .loopback import LoopbackServer
+
+MODES = {"plain": "", "chunked": "?chunked", "gzip": "?gzip", "chunked-gzip": "?chunked&gzip"}
+
+
+def percentile(ordered, fraction):
+    """the value below which fraction of the sorted values fall"""
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def drive(url, requests=100, concurrency=4, ssl_context=None):
+    """send requests to url from concurrency threads
+
+    Returns:
+        dict: latency percentiles in seconds, throughput and error counts
+    """
+    parsed = parse_url(url)
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            _, body = request(parsed, ssl_context)
+        except Exception as error:  # pylint: disable=broad-except
+            return time.perf_counter() - start, None, type(error).__name__
+        return time.perf_counter() - start, len(body), None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, size, _ in results if size is not None)
+    errors = {}
+    for _, _, error in results:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+    received = sum(size for _, size, _ in results if size is not None)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "ok": len(latencies),
+        "errors": errors,
+        "requests per second": len(latencies) / elapsed,
+        "bytes per second": received / elapsed,
+        "latency": {
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+    }
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    args.add_argument("--size", type=int, default=10_000, help="body size in bytes")
+    args.add_argument("--mode", choices=list(MODES), default="plain")
+    args.add_argument("--latency", type=float, default=0.0, help="server latency in seconds")
+    args.add_argument("--bandwidth", type=float, default=None, help="bytes per second per response")
+    args.add_argument("--tls", action="store_true")
+    args.add_argument("--requests", type=int, default=100)
+    args.add_argument("--concurrency", type=int, default=4)
+    args.add_argument("--out", help="write the results to this json file")
+    options = args.parse_args()
+
+    with LoopbackServer(latency=options.latency, bandwidth=options.bandwidth, tls=options.tls) as server:
+        context = server.client_context() if options.tls else None
+        url = server.url(f"/bytes/{options.size}{MODES[options.mode]}")
+        results = drive(url, options.requests, options.concurrency, context)
+    results["config"] = vars(options)
+
+    print(f"{results['ok']}/{results['requests']} ok in {results['seconds']:.2f}s")
+    if results["errors"]:
+        print(f"errors: {results['errors']}")
+    print(f"{results['requests per second']:.1f} requests/s, "
+          f"{results['bytes per second'] / 2**20:.2f} MiB/s")
+    for name, value in results["latency"].items():
+        if value is not None:
+            print(f"{name:>4} {value * 1000:8.1f}ms")
+    if options.out:
+        with open(options.out, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""A self contained HTTP server on the loopback interface for testing and
+load testing src.connection without touching real hosts
+
+    with LoopbackServer(latency=0.05, bandwidth=1_000_000, tls=True) as server:
+        request(parse_url(server.url("/bytes/100000")), server.client_context())
+
+Paths:
+    /bytes/N    a body of N bytes
+    anything in pages
+    anything in redirects, answered with its status and Location
+
+Query options, which can be combined:
+    ?chunked    send the body with Transfer-Encoding: chunked
+    ?gzip       compress the body and send Content-Encoding: gzip
+
+Connections are kept alive when the client asks for it with HTTP/1.1.
+"""
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs
+
+HOST = "localhost"
+CHUNK_SIZE = 16 * 1024
+# bandwidth limits are applied in slices this long
+THROTTLE_INTERVAL = 0.01
+
+# (certfile, keyfile), generated once per process
+CERTIFICATE = None
+
+
+def self_signed_certificate():
+    """generate a self signed certificate for localhost with the openssl cli
+
+    Returns:
+        tuple: the certificate and key file paths
+    """
+    global CERTIFICATE
+    if CERTIFICATE is None:
+        if shutil.which("openssl") is None:
+            raise RuntimeError("the openssl command is needed to generate a certificate")
+        directory = tempfile.mkdtemp(prefix="loopback-")
+        certfile = os.path.join(directory, "cert.pem")
+        keyfile = os.path.join(directory, "key.pem")
+        subprocess.run(
+            [
+                "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                "-keyout", keyfile, "-out", certfile, "-days", "1",
+                "-subj", f"/CN={HOST}",
+                "-addext", f"subjectAltName=DNS:{HOST},IP:127.0.0.1",
+            ],
+            check=True,
+            capture_output=True,
+        )
+        CERTIFICATE = (certfile, keyfile)
+    return CERTIFICATE
+
+
+class LoopbackHandler(BaseHTTPRequestHandler):
+    """serves the pages of the LoopbackServer that owns the http server"""
+
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, with Nagle on a kept alive
+    # connection the body waits for the client's delayed ack of the headers
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.harness.count_connection()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        harness = self.server.harness
+        path, _, query = self.path.partition("?")
+        options = parse_qs(query, keep_blank_values=True)
+        body = harness.body(path)
+        if harness.latency:
+            time.sleep(harness.latency)
+        if path in harness.redirects:
+            harness.count_request()
+            status, location = harness.redirects[path]
+            self.send_response(status)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        harness.count_request()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        for name, value in harness.headers.items():
+            self.send_header(name, value)
+        if "gzip" in options:
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        if "chunked" in options:
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(body), CHUNK_SIZE):
+                chunk = body[i : i + CHUNK_SIZE]
+                self.write(b"%x\r\n" % len(chunk) + chunk + b"\r\n")
+            self.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.write(body)
+
+    def write(self, data):
+        """write to the client, no faster than the server's bandwidth"""
+        bandwidth = self.server.harness.bandwidth
+        if not bandwidth:
+            self.wfile.write(data)
+            return
+        step = max(1, int(bandwidth * THROTTLE_INTERVAL))
+        for i in range(0, len(data), step):
+            piece = data[i : i + step]
+            self.wfile.write(piece)
+            time.sleep(len(piece) / bandwidth)
+
+
+class LoopbackHTTPServer(ThreadingHTTPServer):
+    """a threading http server that stays quiet when clients hang up early"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+class LoopbackServer:
+    """an HTTP(S) server on a free loopback port, running on its own thread
+
+    Args:
+        pages (dict): path -> bytes served as is
+        latency (float): seconds to wait before answering every request
+        bandwidth (float): bytes per second to send bodies at, unlimited if None
+        tls (bool): serve https with a generated self signed certificate
+        redirects (dict): path -> (status, location) to redirect
+        headers (dict): extra headers sent with every page, e.g. Cache-Control
+    """
+
+    def __init__(
+        self, pages=None, latency=0.0, bandwidth=None, tls=False, redirects=None, headers=None
+    ) -> None:
+        self.pages = dict(pages or {})
+        self.redirects = dict(redirects or {})
+        self.headers = dict(headers or {})
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.tls = tls
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def url(self, path="/"):
+        scheme = "https" if self.tls else "http"
+        return f"{scheme}://{HOST}:{self.port}{path}"
+
+    def body(self, path):
+        """the body for a path, or None if there is nothing there"""
+        if path in self.pages:
+            return self.pages[path]
+        if path.startswith("/bytes/") and path[len("/bytes/"):].isdigit():
+            size = int(path[len("/bytes/"):])
+            return (b"<p>" + b"x" * size)[:size]
+        return None
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def count_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def client_context(self):
+        """an ssl context that trusts this server's certificate"""
+        certfile, _ = self_signed_certificate()
+        return ssl.create_default_context(cafile=certfile)
+
+    def start(self):
+        self.httpd = LoopbackHTTPServer(("127.0.0.1", 0), LoopbackHandler)
+        self.httpd.harness = self
+        if self.tls:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(*self_signed_certificate())
+            # handshake on the handler thread instead of the accepting thread
+            self.httpd.socket = context.wrap_socket(
+                self.httpd.socket, server_side=True, do_handshake_on_connect=False
+            )
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, name="loopback-server", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
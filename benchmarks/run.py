@@ -0,0 +1,139 @@
+"""Time every phase of the pipeline on a generated document
+
+    python -m benchmarks.run --depth 4 --breadth 6 --out results.json
+
+Every phase runs on its own input, prepared outside the timed region, so a
+regression in one phase does not show up in the others.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from src.css import CSSParser, cascade_priority, default_style_sheet, style
+from src.display_list import DisplayList
+from src.dom import HTMLParser
+from src.layout import DocumentLayout
+from src.tree_utils import tree_to_list
+
+from .corpus import CorpusConfig, generate_css, generate_html
+from .fonts import StubBrowser
+
+
+def timed(func, setup, repeat):
+    """run setup then time func on its result, repeat times"""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        result = func(arg)
+        runs.append(time.perf_counter() - start)
+    return runs, result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(config, repeat=5, width=800):
+    """benchmark every phase on the document generated from config
+
+    Returns:
+        dict: meta, config, counts and per phase timings in seconds
+    """
+    html = generate_html(config)
+    css = generate_css(config)
+    default_rules = default_style_sheet()
+
+    timings = {}
+    timings["html parse"], nodes = timed(lambda body: HTMLParser(body).parse(), lambda: html, repeat)
+    timings["css parse"], rules = timed(lambda body: CSSParser(body).parse(), lambda: css, repeat)
+    rules = sorted(default_rules + rules, key=cascade_priority)
+
+    def styled():
+        tree = HTMLParser(html).parse()
+        style(tree, rules)
+        return tree
+
+    timings["style"], _ = timed(lambda tree: style(tree, rules), lambda: HTMLParser(html).parse(), repeat)
+    timings["layout"], _ = timed(
+        lambda tree: DocumentLayout(tree, StubBrowser(width)).layout(), styled, repeat
+    )
+    # a reload: the same document laid out again by a browser that has seen it
+    warm = StubBrowser(width)
+    DocumentLayout(styled(), warm).layout()
+    timings["layout cached"], _ = timed(
+        lambda tree: DocumentLayout(tree, warm).layout(), styled, repeat
+    )
+
+    def laid_out():
+        document = DocumentLayout(styled(), StubBrowser(width))
+        document.layout()
+        return document
+
+    def paint(document):
+        display_list = DisplayList()
+        document.paint(display_list)
+        return display_list
+
+    timings["paint"], display_list = timed(paint, laid_out, repeat)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "config": dict(config.as_dict(), repeat=repeat, width=width),
+        "counts": {
+            "html bytes": len(html),
+            "css bytes": len(css),
+            "nodes": len(tree_to_list(nodes, [])),
+            "rules": len(rules),
+            "display list commands": len(display_list),
+        },
+        "phases": {
+            name: {
+                "best": min(runs),
+                "median": statistics.median(runs),
+                "runs": runs,
+            }
+            for name, runs in timings.items()
+        },
+    }
+
+
+def main():
+    defaults = CorpusConfig()
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    for name, value in defaults.as_dict().items():
+        args.add_argument("--" + name.replace("_", "-"), type=type(value), default=value)
+    args.add_argument("--repeat", type=int, default=5)
+    args.add_argument("--width", type=int, default=800)
+    args.add_argument("--out", help="write the results to this json file")
+    options = vars(args.parse_args())
+    repeat, width, out = options.pop("repeat"), options.pop("width"), options.pop("out")
+
+    results = run(CorpusConfig(**options), repeat=repeat, width=width)
+    for name, count in results["counts"].items():
+        print(f"{name:<24}{count:>12}")
+    print()
+    print(f"{'phase':<24}{'best ms':>12}{'median ms':>12}")
+    for name, phase in results["phases"].items():
+        print(f"{name:<24}{phase['best'] * 1000:>12.1f}{phase['median'] * 1000:>12.1f}")
+    if out:
+        with open(out, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
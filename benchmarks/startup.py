@@ -0,0 +1,127 @@
+"""Time from process start to the first browser window, cold and warm
+
+    python -m benchmarks.startup --repeat 5 --out startup.json
+
+Every run starts a fresh interpreter. Cold runs get an empty bytecode
+cache so every module is compiled again, warm runs reuse the cache left
+by the previous run. The first window is when tk maps it, idle is when
+the warm-up deferred to idle time has finished, and warm up is how long
+that took on its own. Without a display only the imports are timed.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs in the child, prints wall clock timestamps as json. The window is
+# first on screen when tk maps it, the deferred warm-up is timed by itself
+CHILD = """
+import json, time
+marks = {}
+import main
+from src.window import Browser
+marks["imports"] = time.time()
+
+warm_up = Browser.warm_up
+def timed_warm_up(self):
+    marks["warm up start"] = time.time()
+    warm_up(self)
+    marks["idle"] = time.time()
+Browser.warm_up = timed_warm_up
+
+try:
+    browser = Browser(main.WIDTH, main.HEIGHT)
+    browser.window.bind(
+        "<Map>", lambda event: marks.setdefault("first window", time.time())
+    )
+    deadline = time.time() + 10
+    while ("first window" not in marks or "idle" not in marks) and time.time() < deadline:
+        browser.window.update()
+    browser.window.destroy()
+except Exception as error:
+    marks["error"] = repr(error)
+print(json.dumps(marks))
+"""
+
+
+def start_once(pycache_prefix):
+    """start the browser in a new interpreter
+
+    Returns:
+        dict: seconds from spawning the process to each mark
+    """
+    command = [sys.executable, "-X", f"pycache_prefix={pycache_prefix}", "-c", CHILD]
+    # warm runs need the bytecode the cold run wrote
+    env = {name: value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+    start = time.time()
+    output = subprocess.run(
+        command, cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    marks = json.loads(output.strip().splitlines()[-1])
+    error = marks.pop("error", None)
+    warm_up_start = marks.pop("warm up start", None)
+    timings = {name: stamp - start for name, stamp in marks.items()}
+    if warm_up_start is not None and "idle" in marks:
+        # what deferring the warm-up took off the first window
+        timings["warm up"] = marks["idle"] - warm_up_start
+    if error:
+        timings["error"] = error
+    return timings
+
+
+def summarize(runs):
+    names = [name for name in runs[0] if name != "error"]
+    summary = {
+        name: {
+            "best": min(run[name] for run in runs),
+            "median": statistics.median(run[name] for run in runs),
+        }
+        for name in names
+    }
+    errors = {run["error"] for run in runs if "error" in run}
+    if errors:
+        summary["errors"] = sorted(errors)
+    return summary
+
+
+def run(repeat=5):
+    """time cold and warm starts
+
+    Returns:
+        dict: cold and warm summaries of the seconds to every mark
+    """
+    cold, warm = [], []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="startup-") as pycache_prefix:
+            cold.append(start_once(pycache_prefix))
+            warm.append(start_once(pycache_prefix))
+    return {"repeat": repeat, "cold": summarize(cold), "warm": summarize(warm)}
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    args.add_argument("--repeat", type=int, default=5)
+    args.add_argument("--out", help="write the results to this json file")
+    options = args.parse_args()
+
+    results = run(options.repeat)
+    print(f"{'start':<8}{'mark':<16}{'best ms':>12}{'median ms':>12}")
+    for kind in ["cold", "warm"]:
+        for name, mark in results[kind].items():
+            if name == "errors":
+                print(f"{kind:<8}errors: {', '.join(mark)}")
+                continue
+            print(f"{kind:<8}{name:<16}{mark['best'] * 1000:>12.1f}{mark['median'] * 1000:>12.1f}")
+    if options.out:
+        with open(options.out, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
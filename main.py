@@ -1,27 +1,53 @@
 """
 This is a simple HTTP client that can download a web page from a URL.
+
+Only argparse is imported up front, tkinter and the browser are imported
+once the arguments are parsed so --help and bad arguments return quickly.
 """
 import argparse
-import logging
-import logging.config
-import tkinter as tk
-logging.config.fileConfig("logging.config")
-logger = logging.getLogger(name="root")
-
-from src.window import Browser
+import os
 
 WIDTH, HEIGHT = 800, 600
+LOGGING_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logging.config")
 
 # https://browser.engineering/http.html
 
 args = argparse.ArgumentParser()
-args.add_argument("--url", help="The URL to download")
+args.add_argument("--url", nargs="+", required=True, help="The URLs to open, one tab each")
+args.add_argument(
+    "--profile", action="store_true", help="print where the page load spent its time"
+)
+args.add_argument(
+    "--trace", metavar="FILE", help="write a Chrome trace of the page load to FILE"
+)
 
 
 def main():
     """main function"""
-    url = args.parse_args().url
-    Browser(WIDTH, HEIGHT).load(url)
+    options = args.parse_args()
+    # pylint: disable=import-outside-toplevel
+    import logging.config
+    import tkinter as tk
+
+    from src.profiling import PROFILER
+    from src.window import Browser
+
+    logging.config.fileConfig(LOGGING_CONFIG)
+    if options.profile:
+        PROFILER.enable()
+    report = (lambda: print(PROFILER.format_report())) if options.profile else None
+    browser = Browser(WIDTH, HEIGHT)
+
+    def open_tabs():
+        first, *others = options.url
+        browser.load(first, trace=options.trace, callback=report)
+        for url in others:
+            browser.new_tab(url)
+        browser.switch_tab(browser.tabs[0])
+
+    # the loader workers measure text with tk fonts, which needs the event
+    # loop running, and by then the default fonts are warm
+    browser.window.after_idle(open_tabs)
     tk.mainloop()
 
 
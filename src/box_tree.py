@@ -0,0 +1,92 @@
+""" The box tree, what layout lays out, built from the DOM in its own pass
+
+    Every element is classified once: a block container holds child boxes,
+    an inline container holds the DOM nodes that are broken into lines. When
+    a block container also has inline children, every run of them is wrapped
+    in an anonymous block, so text and inline elements between two blocks
+    share lines instead of getting a block each.
+
+    box = build_box_tree(html_node)
+    # after DOM mutations, only the dirty parts are classified again
+    box = build_box_tree(html_node, box)
+"""
+from .dom import is_block
+
+
+class LayoutBox:
+    """a node of the box tree
+
+    Args:
+        node (Element): the element, for anonymous blocks the element whose
+            inline children they wrap
+        anonymous (bool): whether the box wraps a run of inline children
+        inlines (tuple): the DOM nodes laid out as lines, empty for block
+            containers
+    """
+
+    __slots__ = ("node", "anonymous", "children", "inlines")
+
+    def __init__(self, node, anonymous=False, inlines=()) -> None:
+        self.node = node
+        self.anonymous = anonymous
+        self.children = []
+        self.inlines = inlines
+
+    @property
+    def dirty(self):
+        """whether the DOM the box covers changed since it was laid out"""
+        if self.inlines:
+            return any(node.layout_dirty or node.descendant_dirty for node in self.inlines)
+        return self.node.layout_dirty or self.node.descendant_dirty
+
+    def __repr__(self):
+        if self.anonymous:
+            return f"LayoutBox(anonymous, {self.inlines!r})"
+        return f"LayoutBox({self.node!r})"
+
+
+def build_box_tree(node, box=None):
+    """build the box of an element, or bring an existing one up to date
+
+    An element is only classified again when its children changed, boxes of
+    unchanged child elements are kept so layout can reuse their geometry.
+
+    Args:
+        node (Element): the element
+        box (LayoutBox): its box from the last pass
+
+    Returns:
+        LayoutBox: the box
+    """
+    if box is None:
+        box = LayoutBox(node)
+    elif not node.layout_dirty:
+        for child in box.children:
+            if not child.anonymous and (child.node.layout_dirty or child.node.descendant_dirty):
+                build_box_tree(child.node, child)
+        return box
+    children = node.children
+    if not any(map(is_block, children)):
+        # no block children, the element is laid out as lines, or is empty
+        box.children = []
+        box.inlines = (node,) if children else ()
+        return box
+    existing = {child.node: child for child in box.children if not child.anonymous}
+    boxes = []
+    run = []
+    for child in children:
+        if not is_block(child):
+            run.append(child)
+            continue
+        if run:
+            boxes.append(LayoutBox(node, anonymous=True, inlines=tuple(run)))
+            run = []
+        old = existing.get(child)
+        if old is None or child.layout_dirty or child.descendant_dirty:
+            old = build_box_tree(child, old)
+        boxes.append(old)
+    if run:
+        boxes.append(LayoutBox(node, anonymous=True, inlines=tuple(run)))
+    box.children = boxes
+    box.inlines = ()
+    return box
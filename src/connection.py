@@ -1,9 +1,50 @@
 """ utilities for making http requests
 """
-from dataclasses import dataclass, field
+import base64
+import codecs
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+import mmap
+import os
+import re
 import socket
 import ssl
-from typing import Any
+import threading
+import time
+from urllib.parse import unquote_to_bytes
+
+from .profiling import PROFILER
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+REDIRECT_STATUSES = {"301", "302", "303", "307", "308"}
+# permanent redirects are cached and skipped on later requests
+PERMANENT_STATUSES = {"301", "308"}
+# responses that never have a body, whatever their headers say
+NO_BODY_STATUSES = {"204", "304"}
+MAX_REDIRECTS = 10
+REDIRECT_CACHE_SIZE = 256
+# bytes of response bodies the http cache keeps
+HTTP_CACHE_BUDGET = 32 * 2**20
+# idle keep-alive connections kept per host
+MAX_IDLE_CONNECTIONS = 6
+# bytes of a local file decoded at a time
+TEXT_CHUNK_SIZE = 64 * 1024
+# how far into a body to look for a declared charset
+SNIFF_BYTES = 1024
+BOMS = [(b"\xef\xbb\xbf", "utf-8"), (b"\xff\xfe", "utf-16-le"), (b"\xfe\xff", "utf-16-be")]
+# <meta charset="x">, <meta http-equiv=... content="text/html; charset=x"> and @charset "x"
+META_CHARSET = re.compile(rb"""(?:<meta[^>]*?charset|@charset)\s*=?\s*["']?\s*([-\w.:]+)""", re.IGNORECASE)
+
+# built on first use, loading the system certificates is slow
+DEFAULT_SSL_CONTEXT = None
+
+
+def default_ssl_context():
+    """the ssl context used for https requests unless another one is passed in"""
+    global DEFAULT_SSL_CONTEXT
+    if DEFAULT_SSL_CONTEXT is None:
+        DEFAULT_SSL_CONTEXT = ssl.create_default_context()
+    return DEFAULT_SSL_CONTEXT
 
 
 @dataclass
@@ -30,11 +71,13 @@ class HTTPResponse:
     status (Status): the status code and explanation
     headers (dict): the headers
     body (str): the body of the response
+    url (str): the url the response came from, after any redirects
     """
 
     version: str
     status: field(default_factory=lambda: Status(200, "OK"))
     headers: dict = field(default_factory=dict)
+    url: str = None
 
 
 @dataclass
@@ -46,9 +89,125 @@ class URL:
     port: int
     path: str
 
+    def __str__(self):
+        if self.scheme == "data":
+            return f"data:{self.path}"
+        if self.scheme == "file" or self.port == DEFAULT_PORTS.get(self.scheme):
+            return f"{self.scheme}://{self.host}{self.path}"
+        return f"{self.scheme}://{self.host}:{self.port}{self.path}"
+
+
+class TooManyRedirects(Exception):
+    """raised when a url redirects more than MAX_REDIRECTS times"""
+
+
+class RedirectCache:
+    """the targets of permanent redirects, least recently used dropped first
+
+    Args:
+        capacity (int): the number of redirects to remember
+    """
+
+    def __init__(self, capacity=REDIRECT_CACHE_SIZE) -> None:
+        self.capacity = capacity
+        # url -> location, most recently used last
+        self.redirects = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        with self.lock:
+            location = self.redirects.get(url)
+            if location is not None:
+                self.redirects.move_to_end(url)
+            return location
+
+    def add(self, url, location):
+        with self.lock:
+            self.redirects[url] = location
+            self.redirects.move_to_end(url)
+            if len(self.redirects) > self.capacity:
+                self.redirects.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.redirects.clear()
+
+
+PERMANENT_REDIRECTS = RedirectCache()
+
+
+def freshness_lifetime(headers):
+    """how many seconds a response may be reused for, from Cache-Control
+
+    Only responses with an explicit max-age are reused, without heuristics.
+    """
+    max_age = 0
+    for directive in headers.get("cache-control", "").lower().split(","):
+        name, _, value = directive.strip().partition("=")
+        if name in ("no-store", "no-cache"):
+            return 0
+        if name == "max-age" and value.strip('"').isdigit():
+            max_age = int(value.strip('"'))
+    return max_age
+
+
+class HTTPCache:
+    """fresh 200 responses by url, shared by every tab, least recently used
+    dropped first to keep the bodies within a budget
+
+    Args:
+        budget (int): the bytes of bodies to keep at most
+    """
+
+    def __init__(self, budget=HTTP_CACHE_BUDGET) -> None:
+        self.budget = budget
+        # url -> (expiry, response, body), most recently used last
+        self.responses = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        """a fresh cached (response, body) for url, or None"""
+        with self.lock:
+            cached = self.responses.get(url)
+            if cached is None:
+                return None
+            expiry, response, body = cached
+            if expiry <= time.monotonic():
+                del self.responses[url]
+                self.size -= len(body)
+                return None
+            self.responses.move_to_end(url)
+            return response, body
+
+    def put(self, url, response, body):
+        """keep a response if its headers allow reusing it"""
+        lifetime = freshness_lifetime(response.headers)
+        if lifetime <= 0 or len(body) > self.budget:
+            return
+        # a copy, the caller keeps the buffer
+        body = bytes(body)
+        with self.lock:
+            previous = self.responses.pop(url, None)
+            if previous is not None:
+                self.size -= len(previous[2])
+            self.responses[url] = (time.monotonic() + lifetime, response, body)
+            self.size += len(body)
+            while self.size > self.budget:
+                _, (_, _, evicted) = self.responses.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.responses.clear()
+            self.size = 0
+
+
+HTTP_CACHE = HTTPCache()
+
 def resolve_url(url, current):
     """ resolve url's relative to the current path"""
-    if "://" in url:
+    if "://" in url or url.startswith("data:"):
         return url
     elif url.startswith("/"):
         # relative to the host
@@ -74,76 +233,360 @@ def parse_url(url: str):
     Returns:
         URL: a URL object
     """
+    if url.startswith("data:"):
+        # data:[media type][;base64],data is kept whole as the path
+        return URL("data", "", None, url[len("data:"):])
     scheme, url = url.split("://", 1)
     if url.count("/") == 0:
         url += "/"
     host, path = url.split("/", 1)
     path = "/" + path  # add back the leading slash
-    port = 443 if scheme == "https" else 80
+    port = DEFAULT_PORTS.get(scheme, 80)
     if ":" in host:
         host, p = host.split(":", 1)
         port = int(p)
     return URL(scheme, host, port, path)
 
 
-def get_page(sock: Any, url: URL):
-    """uses a socket to get a page
+def charset_of(headers):
+    """the charset declared in the Content-Type header, if any"""
+    for param in headers.get("content-type", "").split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset":
+            return value.strip().strip("'\"")
+    return None
+
+
+def sniff_charset(body: bytes):
+    """the charset a document declares with <meta charset> or @charset near its start"""
+    match = META_CHARSET.search(body, 0, SNIFF_BYTES)
+    return match.group(1).decode("ascii") if match else None
+
+
+def detect_charset(head: bytes, headers):
+    """the charset of a body from its byte order mark, the Content-Type
+    header or the document itself, falling back to utf-8
 
     Args:
-        sock (Any): a socket
-        url (URL): the url to get
+        head (bytes): at least the first SNIFF_BYTES of the body
+        headers (dict): the response headers
+
+    Returns:
+        tuple: the codec name and the length of the byte order mark to skip
+    """
+    for bom, charset in BOMS:
+        if head.startswith(bom):
+            return charset, len(bom)
+    for charset in (charset_of(headers), sniff_charset(head)):
+        if charset:
+            try:
+                return codecs.lookup(charset).name, 0
+            except LookupError:
+                continue
+    return "utf-8", 0
+
+
+def decode(body: bytes, headers):
+    """decode a body once, with the charset from detect_charset
+
+    Returns:
+        str: the decoded body, undecodable bytes are replaced
+    """
+    charset, skip = detect_charset(body[:SNIFF_BYTES], headers)
+    with memoryview(body) as view, view[skip:] as text:
+        return str(text, charset, "replace")
+
+
+class MappedText:
+    """a local file, memory mapped and decoded as it is read
+
+    Iterating gives the text in chunks for the incremental parser, so a
+    large file is never held in memory whole, neither as bytes nor as text.
+
+    Args:
+        path (str): the file to read
+        chunk_size (int): the number of bytes decoded at a time
+    """
+
+    def __init__(self, path, chunk_size=TEXT_CHUNK_SIZE) -> None:
+        self.path = path
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        with open(self.path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                # empty files cannot be mapped
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                charset, start = detect_charset(mapped[:SNIFF_BYTES], {})
+                decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+                for offset in range(start, len(mapped), self.chunk_size):
+                    yield decoder.decode(mapped[offset : offset + self.chunk_size])
+                yield decoder.decode(b"", final=True)
+
+    def read(self):
+        """the whole file as text"""
+        with open(self.path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return decode(mapped, {})
+
+
+def data_url(url: URL):
+    """decode the contents of a data: url, base64 or percent encoded
 
     Returns:
+        tuple: the headers, with the content type, and the decoded text
+    """
+    media_type, _, data = url.path.partition(",")
+    params = media_type.split(";")
+    payload = unquote_to_bytes(data)
+    if params[-1].strip().lower() == "base64":
+        params.pop()
+        payload = base64.b64decode(payload)
+    headers = {"content-type": ";".join(params) or "text/plain;charset=US-ASCII"}
+    return headers, decode(payload, headers)
+
+
+class Connection:
+    """a socket to one host and port with a buffered binary reader
+
+    Responses with a Content-Length leave the socket ready for the next
+    request, so connections are pooled and reused, see CONNECTIONS. Only
+    requests with the same ssl context share a connection, it was verified
+    with that context.
+    """
+
+    def __init__(self, url: URL, ssl_context=None) -> None:
+        self.key = (url.scheme, url.host, url.port, ssl_context)
+        sock = socket.socket(
+            family=socket.AF_INET,
+            type=socket.SOCK_STREAM,
+            proto=socket.IPPROTO_TCP,
+        )
+        try:
+            sock.connect((url.host, url.port))
+            if url.scheme == "https":
+                ctx = ssl_context or default_ssl_context()
+                sock = ctx.wrap_socket(sock, server_hostname=url.host)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        # set by get_page when the response leaves the socket reusable
+        self.reusable = False
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+class ConnectionPool:
+    """idle keep-alive connections, by scheme, host, port and ssl context"""
+
+    def __init__(self, max_idle=MAX_IDLE_CONNECTIONS) -> None:
+        self.max_idle = max_idle
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url: URL, ssl_context=None):
+        """an idle connection to url's host made with ssl_context, or None"""
+        with self.lock:
+            idle = self.idle.get((url.scheme, url.host, url.port, ssl_context))
+            return idle.pop() if idle else None
+
+    def release(self, connection: Connection):
+        """keep a connection for later if its last response allows it"""
+        if connection.reusable:
+            with self.lock:
+                idle = self.idle.setdefault(connection.key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(connection)
+                    return
+        connection.close()
+
+    def close_all(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+CONNECTIONS = ConnectionPool()
+
+
+def read_body(reader, length):
+    """read exactly length bytes into a preallocated buffer
+
+    The buffered reader hands out what it has buffered and reads the rest
+    straight into the buffer with recv_into, without intermediate copies.
+    """
+    body = bytearray(length)
+    view = memoryview(body)
+    received = 0
+    while received < length:
+        n = reader.readinto(view[received:])
+        if not n:
+            raise ConnectionError(f"connection closed after {received} of {length} bytes")
+        received += n
+    return body
+
 
+def get_page(connection: Connection, url: URL):
+    """send a request for url on a connection and read the response
+
+    Args:
+        connection (Connection): an open connection to url's host
+        url (URL): the url to get
+
+    Returns:
+        tuple: the HTTPResponse and the undecoded body
     """
-    sock.connect((url.host, url.port))
-    sock.send(
+    connection.reusable = False
+    connection.sock.sendall(
         f"GET {url.path} HTTP/1.0\r\n".encode("utf8")
-        + f"Host: {url.host}\r\n\r\n".encode("utf8")
+        + f"Host: {url.host}\r\n".encode("utf8")
+        + b"Connection: keep-alive\r\n\r\n"
     )
-    response = sock.makefile("r", encoding="utf8", newline="\r\n")
-    status_line = response.readline()
-    version, status, explanation = status_line.split(" ", 2)
-    assert status == "200", f"{status}: {explanation}"
+    reader = connection.reader
+    status_line = reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed before the response")
+    version, status, explanation = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
     headers = {}
     while True:
-        line = response.readline()
-        if line == "\r\n":
+        line = reader.readline()
+        if line in (b"\r\n", b"\n", b""):
             break
-        header, value = line.split(":", 1)
+        header, value = line.decode("latin-1").split(":", 1)
         headers[header.lower()] = value.strip()
     assert "transfer-encoding" not in headers
     assert "content-encoding" not in headers
-    body = response.read()
+    if status.startswith("1"):
+        # an interim response has no body, the final response still follows
+        # on the socket so it is not reused
+        body = b""
+    elif status in NO_BODY_STATUSES or "content-length" in headers:
+        no_body = status in NO_BODY_STATUSES
+        body = b"" if no_body else read_body(reader, int(headers["content-length"]))
+        keep_alive = headers.get("connection", "").lower() == "keep-alive" or (
+            version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        )
+        connection.reusable = keep_alive
+    else:
+        # the body runs until the server closes the connection
+        body = reader.read()
     return HTTPResponse(version, Status(status, explanation), headers), body
 
 
-def request(url: URL):
+def fetch(url: URL, ssl_context=None):
+    """get a response over a pooled connection
+
+    A reused connection may have been closed by the server while it was
+    idle, in which case the request is retried once on a new connection.
+    """
+    connection = CONNECTIONS.acquire(url, ssl_context)
+    if connection is not None:
+        try:
+            response = get_page(connection, url)
+        except (ConnectionError, OSError):
+            connection.close()
+        except BaseException:
+            connection.close()
+            raise
+        else:
+            CONNECTIONS.release(connection)
+            return response
+    connection = Connection(url, ssl_context)
+    try:
+        response = get_page(connection, url)
+    except BaseException:
+        connection.close()
+        raise
+    CONNECTIONS.release(connection)
+    return response
+
+
+def follow_redirects(url: URL, ssl_context=None):
+    """fetch a url, following up to MAX_REDIRECTS redirects
+
+    Relative locations are resolved against the url that redirected.
+    Permanent redirects are remembered in PERMANENT_REDIRECTS, so later
+    requests for the same url go straight to the target. A redirect to the
+    same host reuses the connection. Fresh responses come from HTTP_CACHE.
+
+    Returns:
+        tuple: the final HTTPResponse, with its url set, and the undecoded body
+    """
+    start = current = str(url)
+    for _ in range(MAX_REDIRECTS + 1):
+        location = PERMANENT_REDIRECTS.get(current)
+        if location is None:
+            cached = HTTP_CACHE.get(current)
+            if cached is not None:
+                PROFILER.count("http cache hits")
+                return cached
+            response, body = fetch(url, ssl_context)
+            status = response.status.code
+            if status not in REDIRECT_STATUSES or "location" not in response.headers:
+                response = replace(response, url=current)
+                if status == "200":
+                    HTTP_CACHE.put(current, response, body)
+                return response, body
+            location = resolve_url(response.headers["location"], current)
+            if status in PERMANENT_STATUSES:
+                PERMANENT_REDIRECTS.add(current, location)
+        url = parse_url(location)
+        if url.scheme not in ["http", "https"]:
+            raise ValueError(f"{current} redirects to unsupported url {location}")
+        current = location
+    raise TooManyRedirects(f"more than {MAX_REDIRECTS} redirects from {start}")
+
+
+def request(url: URL, ssl_context=None):
     """makes an http request
 
     Args:
         url (URL): the url to request
+        ssl_context (ssl.SSLContext): the context for https requests,
+            defaults to one that verifies against the system certificates
 
     Returns:
-        Response: an HTTP response
+        tuple: the HTTPResponse (None for files) and the decoded body
     """
     if url.scheme in ["http", "https"]:
-        with socket.socket(
-            family=socket.AF_INET,
-            type=socket.SOCK_STREAM,
-            proto=socket.IPPROTO_TCP,
-        ) as sock:
-            if url.scheme == "https":
-                ctx = ssl.create_default_context()
-                with ctx.wrap_socket(sock, server_hostname=url.host) as secure_sock:
-                    return get_page(secure_sock, url)
-            elif url.scheme == "http":
-                return get_page(sock, url)
+        response, body = follow_redirects(url, ssl_context)
+        status = response.status
+        assert status.code == "200", f"{status.code}: {status.explanation}"
+        return response, decode(body, response.headers)
     elif url.scheme == "file":
-        with open(
-            url.host + "/" + url.path, encoding="utf-8"
-        ) as file:
-            html = file.read()
-            return None, html
+        return None, MappedText(file_path(url)).read()
+    elif url.scheme == "data":
+        _, text = data_url(url)
+        return None, text
     else:
         raise ValueError(f"Unknown scheme {url.scheme}")
+
+
+def request_chunks(url: URL, ssl_context=None):
+    """makes a request, for the incremental parser
+
+    Local files are decoded a chunk at a time as they are parsed, see
+    MappedText, anything else is requested whole.
+
+    Returns:
+        tuple: the HTTPResponse (None for files and data urls) and an
+            iterable of the decoded text in chunks
+    """
+    if url.scheme == "file":
+        return None, MappedText(file_path(url))
+    response, body = request(url, ssl_context)
+    return response, [body]
+
+
+def file_path(url: URL):
+    """the local path of a file: url"""
+    return url.host + "/" + url.path
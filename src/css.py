@@ -1,11 +1,17 @@
 """CSS Parser"""
 import logging
+import os
 
 from .dom import Element
+from .profiling import PROFILER
 
 
 logger = logging.getLogger(name="root")
 
+DEFAULT_STYLE_SHEET_PATH = os.path.join(os.path.dirname(__file__), "browser.css")
+# compiled on first use, see default_style_sheet
+DEFAULT_STYLE_SHEET = None
+
 
 INHERITED_PROPERTIES = {
     "font-family": "Times New Roman",
@@ -16,11 +22,76 @@ INHERITED_PROPERTIES = {
     "white-space": "normal"
 }
 
+def default_style_sheet():
+    """the browser's own rules, parsed once and shared by every page
+
+    Returns:
+        list: (selector, body) rules, callers must copy before extending
+    """
+    global DEFAULT_STYLE_SHEET
+    if DEFAULT_STYLE_SHEET is None:
+        with open(DEFAULT_STYLE_SHEET_PATH, "r", encoding="utf-8") as file:
+            with PROFILER.phase("css parse", "browser.css"):
+                DEFAULT_STYLE_SHEET = CSSParser(file.read()).parse()
+    return DEFAULT_STYLE_SHEET
+
 def cascade_priority(rule):
     """sort the rules by priority"""
     selector, _ = rule
     return selector.priority
 
+def style(node, rules):
+    """compute the style of a node and its subtree
+
+    Args:
+        node (Node): the root of the subtree to style
+        rules (list): (selector, body) rules sorted by cascade_priority
+    """
+    node.style = {}
+    node.style_dirty = False
+    # a new style can change fonts, so the node needs a new layout
+    node.layout_dirty = True
+    # inherit from parent before applying explicit styles
+    for prop, default_value in INHERITED_PROPERTIES.items():
+        if node.parent:
+            node.style[prop] = node.parent.style.get(prop, default_value)
+        else:
+            node.style[prop] = default_value
+    if isinstance(node, Element) and "style" in node.attributes:
+        pairs = CSSParser(node.attributes["style"]).body()
+        for prop,val in pairs.items():
+            node.style[prop] = val
+    PROFILER.count("selector matches", len(rules))
+    for selector, body in rules:
+        if not selector.matches(node):
+            continue
+
+        for prop, value in body.items():
+            node.style[prop] = value
+    if node.style["font-size"].endswith("%"):
+        if node.parent:
+            parent_font_size = node.parent.style["font-size"]
+        else:
+            parent_font_size = INHERITED_PROPERTIES["font-size"]
+        # everything but the %
+        node_pct = float(node.style["font-size"][:-1]) / 100
+        # everything but the px
+        parent_px = float(parent_font_size[:-2])
+        # convert to a fixed value
+        node.style["font-size"] = str(node_pct * parent_px) + "px"
+    for child in node.children:
+        style(child, rules)
+
+
+def restyle(node, rules):
+    """restyle only the subtrees that have been marked style dirty"""
+    if node.style_dirty:
+        style(node, rules)
+    elif node.descendant_dirty:
+        for child in node.children:
+            restyle(child, rules)
+
+
 class CSSParser:
     """recursive descent parser for css files"""
 
@@ -0,0 +1,210 @@
+""" A compact display list that keeps draw commands in parallel typed arrays
+
+    Every command costs a few bytes of array storage instead of a python
+    object with its own attribute dict. Fonts and colors are interned into
+    small tables and referenced by id, and the text of every command lives in
+    one shared utf-8 buffer. Words inside a link carry the id of its href.
+    Command objects (DrawText and DrawRect) are only created on demand when
+    a consumer iterates or indexes the list.
+"""
+from array import array
+from itertools import accumulate
+from operator import add
+
+from .layout import DrawRect, DrawText
+
+TEXT, RECT = 0, 1
+
+
+class InternTable:
+    """maps values to small integer ids
+
+    The table keeps a reference to every value so ids are never reused.
+
+    Args:
+        by_identity (bool): intern by identity instead of by value, for
+            unhashable objects like tk fonts. Equal strings made by every
+            restyle would each get an id of their own.
+    """
+
+    def __init__(self, by_identity=False) -> None:
+        self.by_identity = by_identity
+        self.values = []
+        self.ids = {}
+
+    def intern(self, value):
+        """return the id of value, adding it to the table if needed"""
+        key = id(value) if self.by_identity else value
+        value_id = self.ids.get(key)
+        if value_id is None:
+            value_id = self.ids[key] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def __len__(self):
+        return len(self.values)
+
+
+class DisplayList:
+    """A struct of arrays list of draw commands
+
+    Args:
+        like (DisplayList): share font and color tables with this list, so
+            commands can be copied between the two without remapping ids
+    """
+
+    def __init__(self, like=None) -> None:
+        self.kinds = array("B")
+        self.lefts = array("d")
+        self.tops = array("d")
+        self.rights = array("d")
+        self.bottoms = array("d")
+        # font ids are only meaningful for text commands
+        self.font_ids = array("H")
+        self.color_ids = array("H")
+        # the href of the link a word is in, id 0 is no link
+        self.link_ids = array("L")
+        # command i's text is text[text_offsets[i]:text_offsets[i + 1]]
+        self.text_offsets = array("L", [0])
+        self.text = bytearray()
+        self.fonts = like.fonts if like is not None else InternTable(by_identity=True)
+        self.colors = like.colors if like is not None else InternTable()
+        if like is not None:
+            self.links = like.links
+        else:
+            self.links = InternTable()
+            self.links.intern(None)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def nbytes(self):
+        """the memory taken by the commands, not counting the shared tables"""
+        arrays = [
+            self.kinds, self.lefts, self.tops, self.rights, self.bottoms,
+            self.font_ids, self.color_ids, self.link_ids, self.text_offsets,
+        ]
+        return sum(values.itemsize * len(values) for values in arrays) + len(self.text)
+
+    def add_rect(self, x1, y1, x2, y2, color):
+        """add a filled rectangle"""
+        self.kinds.append(RECT)
+        self.lefts.append(x1)
+        self.tops.append(y1)
+        self.rights.append(x2)
+        self.bottoms.append(y2)
+        self.font_ids.append(0)
+        self.color_ids.append(self.colors.intern(color))
+        self.link_ids.append(0)
+        self.text_offsets.append(len(self.text))
+
+    def add_texts(self, lefts, tops, texts, widths, fonts, colors, linespaces, links=None):
+        """add a batch of words
+
+        Args:
+            lefts (list): x of every word
+            tops (list): y of every word
+            texts (list): the words
+            widths (list): the measured width of every word
+            fonts (list): the tk font of every word
+            colors (list): the color of every word
+            linespaces (list): the line height of every word's font
+            links (list): the href of the link every word is in, or None
+        """
+        self.kinds.extend(array("B", [TEXT]) * len(texts))
+        self.lefts.extend(lefts)
+        self.tops.extend(tops)
+        self.rights.extend(map(add, lefts, widths))
+        self.bottoms.extend(map(add, tops, linespaces))
+        intern = self.fonts.intern
+        self.font_ids.extend([intern(font) for font in fonts])
+        intern = self.colors.intern
+        self.color_ids.extend([intern(color) for color in colors])
+        if links is None:
+            self.link_ids.extend(array("L", [0]) * len(texts))
+        else:
+            intern = self.links.intern
+            self.link_ids.extend([intern(link) for link in links])
+        encoded = [text.encode("utf8") for text in texts]
+        offsets = accumulate(map(len, encoded), initial=len(self.text))
+        # skip the initial offset, it is already the end of the previous command
+        next(offsets)
+        self.text_offsets.extend(offsets)
+        self.text += b"".join(encoded)
+
+    def extend(self, other, start=0, end=None):
+        """copy the commands other[start:end] to the end of this list"""
+        if end is None:
+            end = len(other)
+        if start >= end:
+            return
+        self.kinds.extend(other.kinds[start:end])
+        self.lefts.extend(other.lefts[start:end])
+        self.tops.extend(other.tops[start:end])
+        self.rights.extend(other.rights[start:end])
+        self.bottoms.extend(other.bottoms[start:end])
+        if other.fonts is self.fonts and other.colors is self.colors and other.links is self.links:
+            self.font_ids.extend(other.font_ids[start:end])
+            self.color_ids.extend(other.color_ids[start:end])
+            self.link_ids.extend(other.link_ids[start:end])
+        else:
+            fonts, colors, links = other.fonts.values, other.colors.values, other.links.values
+            self.font_ids.extend(
+                [self.fonts.intern(fonts[i]) for i in other.font_ids[start:end]]
+            )
+            self.color_ids.extend(
+                [self.colors.intern(colors[i]) for i in other.color_ids[start:end]]
+            )
+            self.link_ids.extend(
+                [self.links.intern(links[i]) for i in other.link_ids[start:end]]
+            )
+        text_start = other.text_offsets[start]
+        text_end = other.text_offsets[end]
+        shift = len(self.text) - text_start
+        self.text += other.text[text_start:text_end]
+        self.text_offsets.extend(
+            [offset + shift for offset in other.text_offsets[start + 1 : end + 1]]
+        )
+
+    def link_of(self, i):
+        """the href of the link command i is in, or None"""
+        return self.links.values[self.link_ids[i]]
+
+    def text_of(self, i):
+        """the text of command i"""
+        return self.text[self.text_offsets[i] : self.text_offsets[i + 1]].decode("utf8")
+
+    def command(self, i):
+        """build the DrawText or DrawRect object for command i"""
+        color = self.colors.values[self.color_ids[i]]
+        if self.kinds[i] == RECT:
+            return DrawRect(self.lefts[i], self.tops[i], self.rights[i], self.bottoms[i], color)
+        font = self.fonts.values[self.font_ids[i]]
+        return DrawText(
+            self.lefts[i], self.tops[i], self.text_of(i), font, color, bottom=self.bottoms[i]
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, end, step = index.indices(len(self))
+            assert step == 1, "display lists only support contiguous slices"
+            sliced = DisplayList(like=self)
+            sliced.extend(self, start, max(start, end))
+            return sliced
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("display list index out of range")
+        return self.command(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.command(i)
+
+    def visible(self, top, bottom):
+        """yield the commands that overlap the vertical range top to bottom"""
+        for i, (cmd_top, cmd_bottom) in enumerate(zip(self.tops, self.bottoms)):
+            if cmd_top > bottom or cmd_bottom < top:
+                continue
+            yield self.command(i)
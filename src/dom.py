@@ -1,5 +1,9 @@
 """ DOM abstraction for html parsing
 """
+import html
+import re
+import sys
+
 SELF_CLOSING_TAGS = [
     "area",
     "base",
@@ -16,6 +20,8 @@ SELF_CLOSING_TAGS = [
     "track",
     "wbr",
 ]
+# text is split on these, everything between < and > is a tag
+TAG_DELIMITERS = re.compile("([<>])")
 HEAD_TAGS = [
     "base",
     "basefont",
@@ -28,7 +34,8 @@ HEAD_TAGS = [
     "script",
 ]
 
-BLOCK_ELEMENTS = [
+# a set, it is checked for every node when the box tree is built
+BLOCK_ELEMENTS = frozenset({
     "html",
     "body",
     "article",
@@ -66,77 +73,158 @@ BLOCK_ELEMENTS = [
     "legend",
     "details",
     "summary",
-]
+})
 
 
-def layout_mode(node):
-    """utility function to determine which layout mode to use for a particular layout chunk"""
-    if isinstance(node, Text):
-        return "inline"
-    elif node.children:
-        if any(
-            [
-                isinstance(child, Element) and child.tag in BLOCK_ELEMENTS
-                for child in node.children
-            ]
-        ):
-            # if any of the children are block elements treat this as a block layout
-            # i.e. if a node contains a <p> and <b> tag
-            return "block"
-        else:
-            return "inline"
-    else:
-        return "block"
+def is_block(node):
+    """whether a node is a block level element"""
+    return isinstance(node, Element) and node.tag in BLOCK_ELEMENTS
+
+
+class Node:
+    """Base class for DOM nodes that tracks what needs to be recomputed
+
+    style_dirty: the node (and so its subtree) needs to be restyled
+    layout_dirty: the node's own layout needs to be recomputed
+    descendant_dirty: some node below this one is style or layout dirty
+    """
 
+    def __init__(self, parent=None):
+        self.children = []
+        self.parent = parent
+        self.style_dirty = True
+        self.layout_dirty = True
+        self.descendant_dirty = False
+        # the structural hash of the subtree, see src.layout_cache
+        self.layout_key = None
+
+    def mark_style_dirty(self):
+        """flag this subtree for restyling"""
+        self.style_dirty = True
+        self.mark_layout_dirty()
+
+    def mark_layout_dirty(self):
+        """flag this node for relayout and let its ancestors know"""
+        self.layout_dirty = True
+        node = self.parent
+        # ancestors above a dirty ancestor are already flagged
+        while node and not node.descendant_dirty:
+            node.descendant_dirty = True
+            node = node.parent
 
-class Text:
+
+class Text(Node):
     """Text node"""
 
     def __init__(self, text, parent=None):
+        # children are kept for consistency even though text doesn't have any
+        super().__init__(parent)
         self.text = text
-        # added for consistency even though text doesn't have children
-        self.children = []
-        self.parent = parent
+        # the words, built on first use
+        self.cached_words = None
+
+    @property
+    def words(self):
+        """the text split into words with character references decoded
+
+        Built once and kept until set_text. Words are interned, so the words
+        a page repeats share one string, and one hash, in the font width caches.
+
+        Returns:
+            tuple: the words
+        """
+        if self.cached_words is None:
+            intern = sys.intern
+            self.cached_words = tuple(
+                intern(html.unescape(word) if "&" in word else word)
+                for word in self.text.split()
+            )
+        return self.cached_words
+
+    def set_text(self, text):
+        """replace the text of this node"""
+        self.text = text
+        self.cached_words = None
+        self.mark_layout_dirty()
 
     def __repr__(self):
         return repr(self.text)
 
 
-class Element:
+class Element(Node):
     """Basic HTML element"""
 
     def __init__(self, tag, attributes, parent=None):
+        super().__init__(parent)
         self.tag = tag
         self.attributes = attributes
-        self.children = []
-        self.parent = parent
+
+    def set_attribute(self, name, value):
+        """set an attribute, which may change the style of this subtree"""
+        self.attributes[name.lower()] = value
+        self.mark_style_dirty()
+
+    def insert_child(self, index, child):
+        """insert a node at index in the list of children"""
+        if child.parent:
+            child.parent.remove_child(child)
+        child.parent = self
+        self.children.insert(index, child)
+        child.mark_style_dirty()
+        self.mark_layout_dirty()
+
+    def append_child(self, child):
+        """add a node as the last child"""
+        self.insert_child(len(self.children), child)
+
+    def remove_child(self, child):
+        """remove a child node from this element"""
+        self.children.remove(child)
+        child.parent = None
+        self.mark_layout_dirty()
 
     def __repr__(self):
         return "<" + self.tag + ">"
 
 
+def parse_attributes(text):
+    """split the text between < and > into the tag and its attributes
+
+    Returns:
+        tuple: the lowercased tag and a dict of attributes
+    """
+    parts = text.split()
+    tag = parts[0].lower()
+    attributes = {}
+    for part in parts[1:]:
+        if "=" in part:
+            key, value = part.split("=", 1)
+            # strip outer quotes if they exist
+            if len(value) > 2 and value[0] in ["'", '"']:
+                value = value[1:-1]
+            attributes[key.lower()] = value
+        else:
+            attributes[part.lower()] = ""
+    return tag, attributes
+
+
 class HTMLParser:
-    """HTML parser that builds a DOM tree from HTML text"""
+    """HTML parser that builds a DOM tree from HTML text
+
+    The text can be given all at once to parse(), or in chunks as it
+    arrives with feed() followed by close().
+    """
 
-    def __init__(self, body) -> None:
+    def __init__(self, body="") -> None:
         self.body = body
         self.unfinished = []
+        # the text since the last < or >, and whether it is inside a tag
+        self.text = ""
+        self.in_tag = False
 
     def get_attributes(self, text):
         """parse attributes from a tag"""
-        parts = text.split()
-        tag = parts[0].lower()
-        attributes = {}
-        for part in parts[1:]:
-            if "=" in part:
-                key, value = part.split("=", 1)
-                # strip outer quotes if they exist
-                if len(value) > 2 and value[0] in ["'", '"']:
-                    value = value[1:-1]
-                attributes[key.lower()] = value
-            else:
-                attributes[part.lower()] = ""
-        return tag, attributes
+        return parse_attributes(text)
 
     def implicit_tags(self, tag):
         """handle malformed HTML by looping through
@@ -211,33 +299,46 @@ class HTMLParser:
             self.close_element()
         return self.unfinished.pop()
 
-    def parse(self):
-        """strips html tags from the body of the response and returns the text and tags
+    def feed(self, chunk):
+        """parse the next chunk of the text, tags may span chunks
 
         Args:
-            body (str): the body of the response
-
-        Returns:
-            list: an array of tags and text
+            chunk (str): the next chunk of html
         """
-        text = ""
-        in_tag = False
-        for c in self.body:
-            if c == "<":
-                in_tag = True
+        text = self.text
+        for part in TAG_DELIMITERS.split(chunk):
+            if part == "<":
+                self.in_tag = True
                 if text:
                     self.add_text(text)
                     text = ""
-            elif c == ">":
-                in_tag = False
+            elif part == ">":
+                self.in_tag = False
                 self.add_tag(text)
                 text = ""
             else:
-                text += c
-        if not in_tag and text:
-            self.add_text(text)
+                text += part
+        self.text = text
+
+    def close(self):
+        """parse whatever text is left and return the root node"""
+        if not self.in_tag and self.text:
+            self.add_text(self.text)
+        self.text = ""
         return self.finish()
 
+    def parse(self):
+        """strips html tags from the body of the response and returns the text and tags
+
+        Args:
+            body (str): the body of the response
+
+        Returns:
+            list: an array of tags and text
+        """
+        self.feed(self.body)
+        return self.close()
+
 
 if __name__ == "__main__":
     html = """ 
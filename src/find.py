@@ -0,0 +1,210 @@
+""" Find in page over a text index of the display list
+
+    The index is built once per display list: the text of every word,
+    case folded and joined by single spaces, with where every word starts.
+    Searching is then str.find and str.count over one string, which run at
+    C speed, and a match maps back to its words with a binary search.
+    Only the matches on screen are ever listed, so typing a single letter
+    into the search box of a very long page stays fast.
+
+    index = TextIndex(display_list)
+    search = Search(index, "some words")
+    search.next()
+    rects = index.boxes(search.current, len(search.query))
+"""
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from .display_list import TEXT
+
+
+def normalize(text):
+    """case fold and collapse whitespace, the way the index stores text"""
+    return " ".join(text.casefold().split())
+
+
+class TextIndex:
+    """the searchable text of a display list
+
+    Args:
+        display_list (DisplayList): the painted page
+    """
+
+    def __init__(self, display_list) -> None:
+        self.display_list = display_list
+        kinds, offsets = display_list.kinds, display_list.text_offsets
+        # the display list index of every word, in document order
+        self.commands = [i for i in range(len(kinds)) if kinds[i] == TEXT]
+        text = display_list.text.decode("utf8")
+        if len(text) == len(display_list.text):
+            # ascii, byte offsets are character offsets
+            self.words = [text[offsets[i] : offsets[i + 1]] for i in self.commands]
+        else:
+            self.words = [display_list.text_of(i) for i in self.commands]
+        folded = [word.casefold() for word in self.words]
+        self.text = " ".join(folded)
+        # where every word starts in text, each word is followed by a space
+        self.starts = list(accumulate((len(word) + 1 for word in folded), initial=0))
+        self.starts.pop()
+        # case folding changes the length of a few words, those are
+        # highlighted whole
+        self.folded_lengths = [len(word) for word in folded]
+        # the lowest top and bottom so far, lines only go down the page but
+        # the words of a line in a larger font start higher
+        tops, bottoms = display_list.tops, display_list.bottoms
+        self.tops = list(accumulate((tops[i] for i in self.commands), max))
+        self.bottoms = list(accumulate((bottoms[i] for i in self.commands), max))
+
+    def word_at(self, offset):
+        """the index of the word that contains a text offset"""
+        return bisect_right(self.starts, offset) - 1
+
+    def line_of(self, offset):
+        """the top and bottom of the word at a text offset"""
+        i = self.commands[self.word_at(offset)]
+        return self.display_list.tops[i], self.display_list.bottoms[i]
+
+    def text_range(self, top, bottom):
+        """the text offsets of the words that overlap top to bottom"""
+        first = bisect_left(self.bottoms, top)
+        last = bisect_right(self.tops, bottom)
+        if first >= last:
+            return 0, 0
+        end = self.starts[last - 1] + self.folded_lengths[last - 1]
+        return self.starts[first], end
+
+    def boxes(self, offset, length):
+        """the rectangles covering a match
+
+        Args:
+            offset (int): where the match starts in text
+            length (int): the length of the match
+
+        Returns:
+            list: (x1, y1, x2, y2) for every word the match touches
+        """
+        display_list = self.display_list
+        rects = []
+        end = offset + length
+        for k in range(self.word_at(offset), self.word_at(end - 1) + 1):
+            i = self.commands[k]
+            word = self.words[k]
+            x1, x2 = display_list.lefts[i], display_list.rights[i]
+            start = self.starts[k]
+            if self.folded_lengths[k] == len(word):
+                # only part of the word may match, measure up to its ends
+                font = display_list.fonts.values[display_list.font_ids[i]]
+                left, right = max(offset - start, 0), min(end - start, len(word))
+                if left > 0:
+                    x1 = display_list.lefts[i] + font.measure(word[:left])
+                if right < len(word):
+                    x2 = display_list.lefts[i] + font.measure(word[:right])
+            rects.append((x1, display_list.tops[i], x2, display_list.bottoms[i]))
+        return rects
+
+
+class Search:
+    """the matches of one query in an index, with a current match
+
+    Matches do not overlap, like str.count.
+
+    Args:
+        index (TextIndex): the index to search
+        query (str): the text to find, normalized like the index
+    """
+
+    def __init__(self, index, query) -> None:
+        self.index = index
+        self.query = normalize(query)
+        self.count = index.text.count(self.query) if self.query else 0
+        # the text offset of the current match
+        self.current = None
+
+    def next(self, after=None):
+        """move to the next match, wrapping around at the end
+
+        Args:
+            after (int): search from this offset instead of the current match
+
+        Returns:
+            int: the offset of the new current match, or None
+        """
+        if not self.count:
+            return None
+        text = self.index.text
+        start = after if after is not None else (
+            self.current + len(self.query) if self.current is not None else 0
+        )
+        found = text.find(self.query, start)
+        if found < 0:
+            found = text.find(self.query)
+        self.current = found
+        return found
+
+    def previous(self):
+        """move to the previous match, wrapping around at the start"""
+        if not self.count:
+            return None
+        text = self.index.text
+        found = -1
+        if self.current is not None:
+            # the last match that starts before the current one
+            found = text.rfind(self.query, 0, self.current + len(self.query) - 1)
+        if found < 0:
+            found = text.rfind(self.query)
+        self.current = found
+        return found
+
+    def between(self, top, bottom):
+        """the offsets of the matches on the words that overlap top to bottom"""
+        if not self.count:
+            return []
+        start, end = self.index.text_range(top, bottom)
+        text, query = self.index.text, self.query
+        matches = []
+        found = text.find(query, start, end)
+        while found >= 0:
+            matches.append(found)
+            found = text.find(query, found + len(query), end)
+        return matches
+
+    def narrow(self, query, index=None):
+        """the search for a query typed on from this one
+
+        Keeps the current match when it still matches, so the view does not
+        jump while typing.
+
+        Args:
+            query (str): the new query
+            index (TextIndex): search this index instead, once the page has
+                been laid out again
+
+        Returns:
+            Search: the new search
+        """
+        search = Search(index or self.index, query)
+        current = self.current
+        if current is not None and search.index is not self.index:
+            current = self.anchor(search.index)
+        if current is not None and search.count:
+            if search.index.text.startswith(search.query, current):
+                search.current = current
+            else:
+                search.next(current)
+        elif search.count:
+            search.next()
+        return search
+
+    def anchor(self, index):
+        """the current match's offset in a new index of the page
+
+        Text offsets move whenever a word above the match changes length,
+        so the match is found again by the word it starts in.
+
+        Returns:
+            int: the offset, or None if the page has fewer words now
+        """
+        k = self.index.word_at(self.current)
+        if k >= len(index.starts):
+            return None
+        return index.starts[k] + self.current - self.index.starts[k]
@@ -0,0 +1,153 @@
+""" Session history and a back-forward cache of rendered pages
+
+    History is the list of visited urls with a current position. Leaving a
+    page puts it, fully rendered and with its scroll position, into the
+    back-forward cache, so going back or forward to it does not fetch,
+    parse, style, layout or paint anything.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from .tree_utils import tree_to_list
+
+# rough sizes of the objects a page keeps alive, used to keep the cache
+# within its memory budget
+NODE_BYTES = 600
+LAYOUT_BYTES = 400
+# a measured word costs an entry in eight parallel lists plus the string
+WORD_BYTES = 120
+BFCACHE_BUDGET = 64 * 2**20
+BFCACHE_CAPACITY = 8
+
+
+@dataclass(eq=False)
+class HistoryEntry:
+    """one visit to a url, visiting the same url twice gives two entries"""
+
+    url: str
+
+
+class History:
+    """the urls visited in a window, with back and forward"""
+
+    def __init__(self) -> None:
+        self.entries = []
+        self.index = -1
+
+    @property
+    def current(self):
+        return self.entries[self.index] if self.entries else None
+
+    def can_go_back(self):
+        return self.index > 0
+
+    def can_go_forward(self):
+        return self.index + 1 < len(self.entries)
+
+    def visit(self, url):
+        """add a visit after the current entry, dropping the forward entries
+
+        Returns:
+            tuple: the new entry and the list of dropped entries
+        """
+        dropped = self.entries[self.index + 1 :]
+        del self.entries[self.index + 1 :]
+        self.entries.append(HistoryEntry(url))
+        self.index += 1
+        return self.current, dropped
+
+    def back(self):
+        """move to the previous entry and return it"""
+        if not self.can_go_back():
+            return None
+        self.index -= 1
+        return self.current
+
+    def forward(self):
+        """move to the next entry and return it"""
+        if not self.can_go_forward():
+            return None
+        self.index += 1
+        return self.current
+
+
+def dom_size(nodes):
+    """a rough estimate of the memory a DOM takes, in bytes"""
+    return sum(NODE_BYTES + len(getattr(node, "text", "")) for node in tree_to_list(nodes, []))
+
+
+def rendering_size(document, display_list):
+    """a rough estimate of the memory a layout tree and display list take,
+    in bytes, either can be None"""
+    size = display_list.nbytes if display_list is not None else 0
+    if document is not None:
+        for block in tree_to_list(document, []):
+            size += LAYOUT_BYTES
+            words = getattr(block, "words", None)
+            if words is not None:
+                size += WORD_BYTES * len(words.words)
+    return size
+
+
+def estimate_size(page):
+    """a rough estimate of the memory a rendered page keeps alive
+
+    Args:
+        page (Page): a loaded page
+
+    Returns:
+        int: bytes
+    """
+    return dom_size(page.nodes) + rendering_size(page.document, page.display_list)
+
+
+class BackForwardCache:
+    """rendered pages by history entry, least recently used evicted first
+
+    Args:
+        budget (int): the estimated bytes all cached pages may take
+        capacity (int): the number of pages to keep at most
+    """
+
+    def __init__(self, budget=BFCACHE_BUDGET, capacity=BFCACHE_CAPACITY) -> None:
+        self.budget = budget
+        self.capacity = capacity
+        # entry -> (page, scroll, size), most recently used last
+        self.pages = OrderedDict()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __contains__(self, entry):
+        return entry in self.pages
+
+    def put(self, entry, page, scroll):
+        """cache a page as it was left, evicting others to stay in budget"""
+        self.discard(entry)
+        size = estimate_size(page)
+        if size > self.budget:
+            return
+        self.pages[entry] = (page, scroll, size)
+        self.size += size
+        while self.size > self.budget or len(self.pages) > self.capacity:
+            _, (_, _, evicted) = self.pages.popitem(last=False)
+            self.size -= evicted
+
+    def take(self, entry):
+        """remove and return a cached page
+
+        Returns:
+            tuple: (page, scroll), or None if the page is not cached
+        """
+        if entry not in self.pages:
+            return None
+        page, scroll, size = self.pages.pop(entry)
+        self.size -= size
+        return page, scroll
+
+    def discard(self, entry):
+        """forget a page, e.g. when its entry leaves the history"""
+        if entry in self.pages:
+            _, _, size = self.pages.pop(entry)
+            self.size -= size
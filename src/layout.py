@@ -1,21 +1,29 @@
 """ A module that represents the layout tree in the browser"""
-import html
+from collections import OrderedDict
+import time
 
-from .dom import Text, layout_mode
+from .box_tree import build_box_tree
+from .dom import Text
+from .layout_cache import CachedLayout, style_key, update_keys
+from .line_break import break_lines, cumulative_widths
 
 HSTEP, VSTEP = 13, 18
 SCROLL_STEP = 100
+# number of line break results kept per inline block, one per width
+LINE_CACHE_SIZE = 8
 
 
 class DrawText:
     """abstraction for drawing text on the canvas"""
 
-    def __init__(self, x, y, text, font, color):
+    def __init__(self, x, y, text, font, color, bottom=None):
         self.top = y
         self.left = x
         self.text = text
         self.font = font
-        self.bottom = y + font.metrics("linespace")
+        if bottom is None:
+            bottom = y + font.metrics("linespace")
+        self.bottom = bottom
         self.color = color
 
     def execute(self, scroll, canvas):
@@ -49,12 +57,81 @@ class DrawRect:
         )
 
 
+def enclosing_link(node):
+    """the href of the innermost <a> around node, blocks can be inside links"""
+    while node is not None:
+        if getattr(node, "tag", None) == "a" and "href" in node.attributes:
+            return node.attributes["href"]
+        node = node.parent
+    return None
+
+
+def clear_dirty(node):
+    """mark a subtree as laid out"""
+    node.layout_dirty = False
+    node.descendant_dirty = False
+    for child in node.children:
+        clear_dirty(child)
+
+
+class MeasuredWords:
+    """the words of an inline block, measured once and kept in parallel lists
+    so that line breaking can work on whole runs at a time"""
+
+    def __init__(self) -> None:
+        self.words = []
+        self.widths = []
+        self.spaces = []
+        self.ascents = []
+        self.descents = []
+        self.linespaces = []
+        # tk fonts, ready to be handed to the display list
+        self.fonts = []
+        self.colors = []
+        # the href of the link every word is in, or None
+        self.links = []
+        # indices of the words that follow a forced line break
+        self.breaks = []
+        # cumulative widths, computed once all the words are added
+        self.offsets = None
+        self.right_edges = None
+        # (ascent, descent) when every word shares them, so all lines are alike
+        self.uniform_metrics = None
+
+    def add_run(self, words, widths, font, color, link=None):
+        """add a run of words that share a font, color and link"""
+        n = len(words)
+        self.words.extend(words)
+        self.widths.extend(widths)
+        self.spaces.extend([font.whitespace] * n)
+        self.ascents.extend([font.ascent] * n)
+        self.descents.extend([font.descent] * n)
+        self.linespaces.extend([font.linespace] * n)
+        self.fonts.extend([font.font] * n)
+        self.colors.extend([color] * n)
+        self.links.extend([link] * n)
+
+    def add_break(self):
+        """force a line break before the next word"""
+        self.breaks.append(len(self.words))
+
+    def finish(self):
+        """compute the cumulative widths used for line breaking"""
+        self.offsets, self.right_edges = cumulative_widths(self.widths, self.spaces)
+        if self.words and (
+            min(self.ascents) == max(self.ascents)
+            and min(self.descents) == max(self.descents)
+        ):
+            self.uniform_metrics = (self.ascents[0], self.descents[0])
+
+
 class DocumentLayout:
     """A special type of layout representing the document"""
-    display_list = []
 
     def __init__(self, node, browser) -> None:
         self.node = node
+        # the box tree, built from the DOM before every layout
+        self.box = None
         self.parent = None
         self.children = []
         self.browser = browser
@@ -64,91 +141,276 @@ class DocumentLayout:
         self.height = 2 * VSTEP
 
     def layout(self):
-        """create the child and then begin recursively laying out children"""
-        child = BlockLayout(self.node, self, None, self.browser)
-        self.children.append(child)
+        """create the child and then begin recursively laying out children
+
+        The layout tree is only built on the first call, later calls
+        (e.g. after a resize) reuse it and only redo the geometry. The box
+        tree is brought up to date with the DOM first, see src.box_tree.
+        """
+        self.box = build_box_tree(self.node, self.box)
+        if getattr(self.browser, "layout_cache", None) is not None:
+            update_keys(self.node)
+        if not self.children:
+            child = BlockLayout(self.box, self, None, self.browser)
+            self.children.append(child)
+        child = self.children[0]
         self.width = self.browser.width - 2 * HSTEP
         self.x = HSTEP
         self.y = VSTEP
         child.layout()
         self.height = child.height + 2 * VSTEP
 
-    def paint(self, display_list):
-        self.children[0].paint(display_list)
+    def paint(self, display_list, previous=None):
+        """paint the document, see BlockLayout.paint"""
+        self.children[0].paint(display_list, previous)
 
 
 class BlockLayout:
-    """A layout abstraction for the browser"""
+    """A layout abstraction for the browser
+
+    Args:
+        box (LayoutBox): the box to lay out, see src.box_tree
+        parent (BlockLayout): the containing block
+        previous (BlockLayout): the sibling above, or None
+        browser (Browser): where fonts and the window size come from
+    """
 
-    display_list = []
-    cursor_x = 0
-    cursor_y = 0
-    line = []
     x = 0
     y = 0
 
-    def __init__(self, node, parent, previous, browser) -> None:
+    def __init__(self, box, parent, previous, browser) -> None:
         self.browser = browser
-        self.node = node
+        self.box = box
+        self.node = box.node
         self.parent = parent
         self.previous = previous
         self.children = []
         self.width = self.browser.width
         self.height = self.browser.height
+        # MeasuredWords and the (start, end, baseline, x offset) lines for inline blocks
+        self.words = None
+        self.lines = []
+        # width -> (lines, height), most recently used last
+        self.line_cache = OrderedDict()
+        self.needs_layout = True
+        self.needs_paint = True
+        # the slice of the last display list painted by this subtree
+        self.paint_range = None
+        # the CachedLayout of the last layout
+        self.cached = None
 
     def layout(self):
-        """layout all the block and inline elements in this node"""
-        # t1 = time.perf_counter(), time.process_time()
-        self.width = self.parent.width
-        self.x = self.parent.x
+        """layout all the block and inline elements in this node
+
+        Blocks whose DOM subtree is clean and whose position and width have not
+        changed keep their previous geometry and are skipped entirely. New and
+        dirty blocks look their subtree up in the browser's layout cache, if
+        it has one, see src.layout_cache.
+        """
+        x = self.parent.x
+        width = self.parent.width
         if self.previous:
-            self.y = self.previous.y + self.previous.height
+            y = self.previous.y + self.previous.height
         else:
-            self.y = self.parent.y
-        mode = layout_mode(self.node)
-
-        if mode == "block":
-            previous = None
-            for child in self.node.children:
-                next_node = BlockLayout(child, self, previous, self.browser)
-                self.children.append(next_node)
-                previous = next_node
+            y = self.parent.y
+        box, node = self.box, self.node
+        dirty = box.dirty
+        if (
+            not self.needs_layout
+            and not dirty
+            and (x, y, width) == (self.x, self.y, self.width)
+        ):
+            return
+        cache = getattr(self.browser, "layout_cache", None)
+        if cache is not None and (self.needs_layout or dirty):
+            key = (self.cache_key(), width)
+            cached = cache.get(key)
+            if cached is not None:
+                self.adopt(cached, x, y, width)
+                return
+            start = time.perf_counter()
         else:
-            self.display_list = []
-            self.cursor_x = 0
-            self.cursor_y = 0
-            self.line = []
-            self.walk_html(self.node)
-            self.flush()
-        for child in self.children:
-            child.layout()
-        if mode == "block":
+            key = None
+        self.x, self.y, self.width = x, y, width
+        self.needs_layout = False
+        self.needs_paint = True
+
+        if not box.inlines:
+            self.lines = []
+            if node.layout_dirty or len(self.children) != len(box.children):
+                self.build_children()
+            for child in self.children:
+                child.layout()
             self.height = sum([child.height for child in self.children])
         else:
-            self.height = self.cursor_y
-        # t2 = time.perf_counter(), time.process_time()
-        # print(f'Real Time: {t2[0] - t1[0]:.2f}s | process Time: {t2[1] - t1[1]:.2f}s')
+            self.children = []
+            if dirty:
+                self.words = None
+                self.line_cache.clear()
+            self.lines, self.height = self.line_breaks()
+        if not box.anonymous:
+            # an anonymous block's element is its parent's, which clears it
+            node.layout_dirty = False
+            node.descendant_dirty = False
+        if box.inlines:
+            self.cached = CachedLayout(self.height, self.words, self.lines)
+        else:
+            self.cached = CachedLayout(self.height, children=[child.cached for child in self.children])
+        if key is not None:
+            cache.put(key, self.cached, time.perf_counter() - start)
+
+    def cache_key(self):
+        """a structural hash of the DOM this block lays out, from the keys
+        update_keys left on the nodes
+
+        Words inside a link carry its href, so the link around the block is
+        part of the key too. The text of an anonymous block takes its styles
+        from the element around it, which are not in the text's own keys.
+        """
+        box = self.box
+        if box.anonymous:
+            keys = tuple(node.layout_key for node in box.inlines)
+            return hash((keys, style_key(box.node), enclosing_link(box.node)))
+        return hash((box.node.layout_key, enclosing_link(box.node.parent)))
+
+    def adopt(self, cached, x, y, width):
+        """take a cached layout of the same subtree, placed at x and y"""
+        self.x, self.y, self.width = x, y, width
+        self.height = cached.height
+        self.needs_layout = False
+        self.needs_paint = True
+        self.cached = cached
+        box = self.box
+        if box.inlines:
+            self.children = []
+            self.words, self.lines = cached.words, cached.lines
+            self.line_cache.clear()
+            self.line_cache[width] = (cached.lines, cached.height)
+            for node in box.inlines:
+                clear_dirty(node)
+        else:
+            self.lines = []
+            self.children = []
+            previous = None
+            for child_box, child_cached in zip(box.children, cached.children):
+                child = BlockLayout(child_box, self, previous, self.browser)
+                child_y = previous.y + previous.height if previous else y
+                child.adopt(child_cached, x, child_y, width)
+                self.children.append(child)
+                previous = child
+        if not box.anonymous:
+            self.node.layout_dirty = False
+            self.node.descendant_dirty = False
+
+    def build_children(self):
+        """create a layout object for every child box,
+        reusing the ones that already exist for the same box"""
+        existing = {child.box: child for child in self.children}
+        self.children = []
+        previous = None
+        for box in self.box.children:
+            next_node = existing.get(box)
+            if next_node:
+                next_node.previous = previous
+            else:
+                next_node = BlockLayout(box, self, previous, self.browser)
+            self.children.append(next_node)
+            previous = next_node
+
+    def line_breaks(self):
+        """break the measured words into lines for the current width
+
+        Words are only measured once per block, and the result of line breaking
+        is cached by width so that resizing back and forth is cheap.
 
-    def paint(self, display_list):
+        Returns:
+            tuple: (start, end, baseline, x offset) of every line and the height
+        """
+        if self.words is None:
+            self.words = MeasuredWords()
+            inlines = self.box.inlines
+            link = enclosing_link(inlines[0].parent)
+            for node in inlines:
+                self.walk_html(node, link)
+            self.words.finish()
+        result = self.line_cache.get(self.width)
+        if result is not None:
+            self.line_cache.move_to_end(self.width)
+            return result
+        words = self.words
+        lines = []
+        cursor_y = 0
+        run_start = 0
+        uniform = words.uniform_metrics
+        if uniform:
+            max_ascent, max_descent = uniform
+        for run_end in words.breaks + [len(words.words)]:
+            for start, end in break_lines(
+                words.offsets, words.right_edges, self.width, run_start, run_end
+            ):
+                if not uniform:
+                    max_ascent = max(words.ascents[start:end])
+                    max_descent = max(words.descents[start:end])
+                baseline = cursor_y + 1.25 * max_ascent
+                lines.append((start, end, baseline, words.offsets[start]))
+                cursor_y = baseline + 1.25 * max_descent
+            run_start = run_end
+        result = (lines, cursor_y)
+        self.line_cache[self.width] = result
+        if len(self.line_cache) > LINE_CACHE_SIZE:
+            self.line_cache.popitem(last=False)
+        return result
+
+    def paint(self, display_list, previous=None):
         """paint the display list
 
+        When the display list painted last time is passed in, subtrees whose
+        layout did not change copy their commands from it instead of painting.
+
         Args:
-            display_list (List): list of DrawText and DrawRect objects
+            display_list (DisplayList): the display list to add commands to
+            previous (DisplayList): the display list painted before the last layout
         """
-        bgcolor = self.node.style.get("background-color", "transparent")
+        start = len(display_list)
+        if previous is not None and not self.needs_paint and self.paint_range:
+            display_list.extend(previous, *self.paint_range)
+            self.shift_paint_ranges(start - self.paint_range[0])
+            return
+
+        bgcolor = "transparent"
+        if not self.box.anonymous:
+            bgcolor = self.node.style.get("background-color", "transparent")
         if bgcolor != "transparent":
             x2, y2 = self.x + self.width, self.y + self.height
-            rect = DrawRect(self.x, self.y, x2, y2, bgcolor)
-            display_list.append(rect)
+            display_list.add_rect(self.x, self.y, x2, y2, bgcolor)
+
+        for child in self.children:
+            child.paint(display_list, previous)
+
+        if self.lines:
+            # lines cover every word in order, so only positions are built per line
+            x, y = self.x, self.y
+            words = self.words
+            lefts, tops = [], []
+            for start_word, end_word, baseline, line_x in self.lines:
+                lefts.extend([x + offset - line_x for offset in words.offsets[start_word:end_word]])
+                tops.extend([y + baseline - ascent for ascent in words.ascents[start_word:end_word]])
+            display_list.add_texts(
+                lefts, tops, words.words, words.widths, words.fonts, words.colors,
+                words.linespaces, words.links,
+            )
+        self.paint_range = (start, len(display_list))
+        self.needs_paint = False
 
+    def shift_paint_ranges(self, delta):
+        """move the paint ranges of this subtree along with its copied commands,
+        so a descendant can be copied on its own next time"""
+        if self.paint_range:
+            start, end = self.paint_range
+            self.paint_range = (start + delta, end + delta)
         for child in self.children:
-            child.paint(display_list)
+            child.shift_paint_ranges(delta)
 
-        for x, y, word, font,color in self.display_list:
-            #TODO: should this be
-            # display_list.append(DrawText(self.x + x, self.y + y, word, font, color))
-            display_list.append(DrawText(x, y, word, font, color))
-            
     def get_font(self, node):
         "get the font for this node"
         weight = node.style["font-weight"]
@@ -158,41 +420,26 @@ class BlockLayout:
         size =  int(float(node.style["font-size"][:-2]) * .75)
         return self.browser.get_font(node.style["font-family"], size,weight,style)
     
-    def text(self, node):
-        """adds text to the display list"""
-        color = node.style["color"]
+    def text(self, node, link=None):
+        """measures the words of a text node"""
         font = self.get_font(node)
-        for word in node.text.split():
-                word = html.unescape(word)
-                w = font.font.measure(word)
-                if self.cursor_x + w > self.width:
-                    self.flush()
-                self.line.append((self.cursor_x, word, font.font, color))
-                # add the width of the word and a space
-                self.cursor_x += w + font.whitespace
-
-    def walk_html(self, node):
-        """walk the html tree"""
+        words = node.words
+        self.words.add_run(words, font.measure_all(words), font, node.style["color"], link)
+
+    def walk_html(self, node, link=None):
+        """walk the html tree
+
+        Args:
+            link (str): the href of the <a> the node is in
+        """
+        node.layout_dirty = False
+        node.descendant_dirty = False
         if isinstance(node, Text):
-            self.text(node)
+            self.text(node, link)
         else:
             if node.tag == "br":
-                self.flush()
+                self.words.add_break()
+            elif node.tag == "a" and "href" in node.attributes:
+                link = node.attributes["href"]
             for child in node.children:
-                self.walk_html(child)
-
-    def flush(self):
-        """flush the current line to the display list"""
-        if not self.line:
-            return
-        metrics = [font.metrics() for x, word, font, _ in self.line]
-        max_ascent = max([metric["ascent"] for metric in metrics])
-        baseline = self.cursor_y + 1.25 * max_ascent
-        for rel_x, word, font, color in self.line:
-            x = self.x + rel_x
-            y = self.y + baseline - font.metrics("ascent")
-            self.display_list.append((x, y, word, font, color))
-        self.cursor_x = 0
-        self.line = []
-        max_descent = max([metric["descent"] for metric in metrics])
-        self.cursor_y = baseline + 1.25 * max_descent
+                self.walk_html(child, link)
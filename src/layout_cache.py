@@ -0,0 +1,138 @@
+""" Memoized layout of DOM subtrees
+
+    A block's layout only depends on the DOM below it, the computed styles
+    there and the width it is given, so a structural hash of those is a key
+    for its result. The cached result is relative to the block's origin:
+    its height, its measured words and line boxes, and the same for every
+    child block, so on a hit it is placed at the new position instead of
+    being laid out again. Reloads, and pages that share headers, footers
+    and navigation markup, hit the cache.
+
+    Every browser keeps one cache, it holds the browser's fonts.
+"""
+from collections import OrderedDict
+from operator import itemgetter
+import threading
+
+from .dom import Text
+from .profiling import PROFILER
+
+# cached block layouts, a page has one per block
+LAYOUT_CACHE_SIZE = 4096
+# the inherited styles layout and paint read, every node has them, plus
+# background-color, the rest cannot change a layout
+LAYOUT_PROPERTIES = itemgetter("font-family", "font-size", "font-weight", "font-style", "color")
+
+
+def style_key(node):
+    """the computed styles of an element that layout and paint read"""
+    style = node.style
+    return LAYOUT_PROPERTIES(style), style.get("background-color")
+
+
+def update_keys(node):
+    """compute the structural hash of every dirty subtree, before layout
+
+    Every node keeps the hash of its subtree with the computed styles, in
+    layout_key, clean subtrees keep theirs.
+
+    Returns:
+        int: the hash of node's subtree
+    """
+    if node.layout_key is not None and not node.layout_dirty and not node.descendant_dirty:
+        return node.layout_key
+    if isinstance(node, Text):
+        # text only inherits styles, whoever uses the key adds its
+        # element's, see BlockLayout.cache_key
+        key = hash(node.text)
+    else:
+        children = tuple(map(update_keys, node.children))
+        # the href ends up in the display list, other attributes only
+        # matter through the styles
+        key = hash((node.tag, node.attributes.get("href"), style_key(node), children))
+    node.layout_key = key
+    return key
+
+
+class CachedLayout:
+    """the geometry of a laid out block relative to its origin
+
+    Args:
+        height (float): the block's height
+        words (MeasuredWords): the measured words of an inline block
+        lines (list): the line boxes of an inline block
+        children (list): the CachedLayout of every child block
+    """
+
+    __slots__ = ("height", "words", "lines", "children")
+
+    def __init__(self, height, words=None, lines=None, children=()) -> None:
+        self.height = height
+        self.words = words
+        self.lines = lines
+        self.children = children
+
+
+class LayoutCache:
+    """CachedLayouts by (structural hash, width), least recently used
+    dropped first
+
+    Args:
+        capacity (int): the number of layouts kept at most
+    """
+
+    def __init__(self, capacity=LAYOUT_CACHE_SIZE) -> None:
+        self.capacity = capacity
+        # key -> (CachedLayout, seconds it took to lay out), most recently used last
+        self.layouts = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        # pages are laid out on loader threads as well as the tk thread
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.layouts)
+
+    def get(self, key):
+        """the cached layout for key, or None"""
+        with self.lock:
+            cached = self.layouts.get(key)
+            if cached is None:
+                self.misses += 1
+                PROFILER.count("layout cache misses")
+                return None
+            self.layouts.move_to_end(key)
+            layout, seconds = cached
+            self.hits += 1
+            self.seconds_saved += seconds
+        PROFILER.count("layout cache hits")
+        return layout
+
+    def put(self, key, layout, seconds):
+        """keep a layout that took seconds to compute"""
+        with self.lock:
+            self.layouts[key] = (layout, seconds)
+            self.layouts.move_to_end(key)
+            while len(self.layouts) > self.capacity:
+                self.layouts.popitem(last=False)
+
+    def stats(self):
+        """how well the cache is doing
+
+        Returns:
+            dict: hits, misses, hit rate, seconds saved and entries
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit rate": self.hits / lookups if lookups else 0.0,
+                "seconds saved": self.seconds_saved,
+                "entries": len(self.layouts),
+            }
+
+    def clear(self):
+        with self.lock:
+            self.layouts.clear()
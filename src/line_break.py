@@ -0,0 +1,77 @@
+""" Greedy line breaking over batches of measured word widths
+
+    A word starts a new line when it would overflow the available width and
+    the current line is not empty. With cumulative widths this becomes a
+    search for the first word whose right edge passes the line start plus the
+    available width, so the work per line is a binary search instead of a
+    comparison per word. The cumulative widths do not depend on the available
+    width, so they are computed once per block and reused for every width.
+"""
+from bisect import bisect_right
+from itertools import accumulate
+from operator import add
+
+# numpy is optional, the pure python path gives identical offsets. It is slow
+# to import, so that waits for the first run long enough to need it. False
+# until then, None if numpy is not installed.
+np = False
+
+# below this many words the numpy call overhead outweighs the gain
+NUMPY_MIN_WORDS = 512
+
+
+def load_numpy():
+    """the numpy module, imported on first use, or None without numpy"""
+    global np
+    if np is False:
+        try:
+            import numpy  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np
+
+
+def cumulative_widths(widths, spaces):
+    """compute where every word would start and end if they were all on one line
+
+    Args:
+        widths (list): the width of every word, tkinter measures in whole
+            pixels so all the sums are exact
+        spaces (list): the whitespace that follows every word
+
+    Returns:
+        tuple: the offset of every word, plus a final entry for the end of
+            the run, and the right edge of every word, both non decreasing
+    """
+    if len(widths) >= NUMPY_MIN_WORDS and load_numpy() is not None:
+        widths = np.asarray(widths)
+        offsets = np.concatenate(([0], np.cumsum(widths + np.asarray(spaces))))
+        return offsets.tolist(), (offsets[:-1] + widths).tolist()
+    offsets = list(accumulate(map(add, widths, spaces), initial=0))
+    return offsets, list(map(add, offsets, widths))
+
+
+def break_lines(offsets, right_edges, width, start=0, end=None):
+    """break the words between start and end into lines
+
+    Args:
+        offsets (list): word offsets from cumulative_widths
+        right_edges (list): word right edges from cumulative_widths
+        width (int): the available width
+        start (int): the first word of the run
+        end (int): one past the last word of the run
+
+    Returns:
+        list: (start, end) word indices of every line, the x of a word within
+            its line is offsets[i] - offsets[start]
+    """
+    if end is None:
+        end = len(right_edges)
+    lines = []
+    while start < end:
+        # a line always takes at least one word, even if it overflows
+        line_end = bisect_right(right_edges, offsets[start] + width, start + 1, end)
+        lines.append((start, line_end))
+        start = line_end
+    return lines
@@ -0,0 +1,57 @@
+""" Hit testing clicks against the links of a display list
+
+    Layout tags every word inside an <a href> with its href, see
+    BlockLayout.walk_html, and paint carries the tag into the display list.
+    The index keeps the boxes of those words sorted by top, with the lowest
+    bottom seen so far, so a click finds its line with a binary search and
+    only looks at the few link words around it.
+
+    index = LinkIndex(display_list)
+    href = index.hit(x, y + scroll)
+"""
+from bisect import bisect_right
+from itertools import accumulate
+
+
+class LinkIndex:
+    """the boxes of the words inside links, in document coordinates
+
+    Args:
+        display_list (DisplayList): the painted page
+    """
+
+    def __init__(self, display_list) -> None:
+        self.display_list = display_list
+        link_ids = display_list.link_ids
+        tops = display_list.tops
+        # the commands inside links, sorted by top
+        self.commands = sorted(
+            (i for i in range(len(link_ids)) if link_ids[i]), key=tops.__getitem__
+        )
+        self.tops = [tops[i] for i in self.commands]
+        bottoms = display_list.bottoms
+        self.max_bottoms = list(accumulate((bottoms[i] for i in self.commands), max))
+
+    def __len__(self):
+        return len(self.commands)
+
+    def hit(self, x, y):
+        """the href of the link at a point
+
+        Args:
+            x (float): document x
+            y (float): document y, the window y plus the scroll offset
+
+        Returns:
+            str: the href, or None if there is no link there
+        """
+        display_list = self.display_list
+        # walk back from the last box that starts above y for as long as
+        # some box at or before it still reaches down to y
+        k = bisect_right(self.tops, y) - 1
+        while k >= 0 and self.max_bottoms[k] >= y:
+            i = self.commands[k]
+            if display_list.lefts[i] <= x <= display_list.rights[i] and y <= display_list.bottoms[i]:
+                return display_list.link_of(i)
+            k -= 1
+        return None
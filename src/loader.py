@@ -0,0 +1,213 @@
+""" Loads pages on a worker thread so the Tk event loop stays responsive
+
+    Fetching, parsing, styling, layout and paint run on a background thread
+    and the finished page is handed back through a queue that the Tk thread
+    polls with after(), so only the canvas is touched from the Tk thread.
+    Starting a new load cancels the one in flight: its worker stops at the
+    next phase boundary and anything it still hands back is dropped.
+
+    Fonts are made on the Tk thread, see Browser.get_font. Layout measures
+    text with them from the worker, tkinter forwards those calls to the Tk
+    thread and they are answered between other events, so loads start once
+    the event loop runs.
+"""
+from dataclasses import dataclass
+import queue
+import threading
+from typing import Any
+
+from .connection import parse_url, request_chunks, resolve_url
+from .css import CSSParser, cascade_priority, default_style_sheet, style
+from .display_list import DisplayList
+from .dom import Element, HTMLParser
+from .layout import DocumentLayout
+from .preload import PreloadScanner, ResourceTable
+from .profiling import PROFILER
+from .tree_utils import tree_to_list
+
+# how often the Tk thread checks for a finished load
+POLL_INTERVAL_MS = 16
+
+
+class Cancelled(Exception):
+    """raised on a worker whose load has been superseded"""
+
+
+@dataclass
+class Page:
+    """a loaded page, ready to be drawn
+
+    url (str): the url the page was loaded from, after any redirects
+    nodes (Element): the styled DOM
+    rules (list): the sorted rules the DOM was styled with
+    document (DocumentLayout): the laid out document
+    display_list (DisplayList): the painted document
+    width (int): the browser width the document was laid out for
+    """
+
+    url: str
+    nodes: Any
+    rules: list
+    document: DocumentLayout
+    display_list: DisplayList
+    width: int
+
+
+class LoadTask:
+    """one page load, shared by the Tk thread and the worker running it"""
+
+    def __init__(self, url) -> None:
+        self.url = url
+        self.cancelled = threading.Event()
+        self.thread = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self):
+        """stop the worker if this load has been cancelled"""
+        if self.cancelled.is_set():
+            raise Cancelled(self.url)
+
+
+def stylesheet_links(nodes):
+    """the hrefs of the <link rel=stylesheet> elements in a DOM"""
+    return [
+        node.attributes["href"]
+        for node in tree_to_list(nodes, [])
+        if isinstance(node, Element)
+        and node.tag == "link"
+        and "href" in node.attributes
+        and node.attributes.get("rel") == "stylesheet"
+    ]
+
+
+def load_page(url, rules, browser, task=None):
+    """fetch, parse, style, layout and paint a page
+
+    Args:
+        url (str): the url to load
+        rules (list): the rules every page starts with
+        browser (Browser): what layout gets its fonts and width from
+        task (LoadTask): checked between phases to stop early when cancelled
+
+    Returns:
+        Page: the page, ready to be drawn
+    """
+    task = task or LoadTask(url)
+    with PROFILER.phase("load", url), ResourceTable() as resources:
+        with PROFILER.phase("fetch", url):
+            response, chunks = request_chunks(parse_url(url))
+        if response is not None:
+            # subresources are relative to where any redirects ended up
+            url = response.url
+        task.check()
+        scanner = PreloadScanner()
+        parser = HTMLParser()
+        with PROFILER.phase("html parse"):
+            for chunk in chunks:
+                # stylesheets download while the rest of the html is parsed
+                for href in scanner.feed(chunk):
+                    resources.preload(resolve_url(href, url))
+                parser.feed(chunk)
+                task.check()
+            nodes = parser.close()
+        if PROFILER.enabled:
+            PROFILER.count("nodes", len(tree_to_list(nodes, [])))
+
+        rules = rules.copy()
+        for link in stylesheet_links(nodes):
+            task.check()
+            link_url = resolve_url(link, url)
+            try:
+                css = resources.get(link_url)
+            except Exception:  # pylint: disable=broad-except
+                continue
+            with PROFILER.phase("css parse", link_url):
+                rules.extend(CSSParser(css).parse())
+        rules = sorted(rules, key=cascade_priority)
+        PROFILER.count("rules", len(rules))
+        task.check()
+        with PROFILER.phase("style"):
+            style(nodes, rules)
+        task.check()
+
+        width = browser.width
+        document = DocumentLayout(nodes, browser=browser)
+        with PROFILER.phase("layout"):
+            document.layout()
+        task.check()
+        display_list = DisplayList()
+        with PROFILER.phase("paint"):
+            document.paint(display_list)
+        PROFILER.count("display list commands", len(display_list))
+    return Page(url, nodes, rules, document, display_list, width)
+
+
+class Loader:
+    """runs page loads on worker threads, one at a time
+
+    Args:
+        browser (Browser): what layout gets its fonts and width from
+        rules (list): the rules every page starts with, the browser's
+            default style sheet if None
+    """
+
+    def __init__(self, browser, rules=None) -> None:
+        self.browser = browser
+        self.rules = rules
+        # (task, page, error) from the workers
+        self.results = queue.Queue()
+        self.current = None
+
+    @property
+    def loading(self):
+        return self.current is not None
+
+    def start(self, url):
+        """cancel the load in flight and start loading url
+
+        Returns:
+            LoadTask: the new load
+        """
+        self.cancel()
+        task = LoadTask(url)
+        self.current = task
+        task.thread = threading.Thread(target=self.run, args=(task,), name="loader", daemon=True)
+        task.thread.start()
+        return task
+
+    def cancel(self):
+        """cancel the load in flight, if any"""
+        if self.current is not None:
+            self.current.cancel()
+            self.current = None
+
+    def run(self, task):
+        """the worker, loads the page and queues the result"""
+        try:
+            rules = self.rules if self.rules is not None else default_style_sheet()
+            page = load_page(task.url, rules, self.browser, task)
+        except Cancelled:
+            return
+        except Exception as error:  # pylint: disable=broad-except
+            self.results.put((task, None, error))
+            return
+        self.results.put((task, page, None))
+
+    def poll(self):
+        """collect the result of the current load, without blocking
+
+        Results of cancelled loads are dropped.
+
+        Returns:
+            tuple: (page, error) once the current load has finished, else None
+        """
+        while True:
+            try:
+                task, page, error = self.results.get_nowait()
+            except queue.Empty:
+                return None
+            if task is self.current:
+                self.current = None
+                return page, error
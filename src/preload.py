@@ -0,0 +1,108 @@
+""" Speculative fetching of subresources ahead of the HTML parser
+
+    The preload scanner looks for stylesheet links in the raw HTML as it
+    arrives, without building a tree, so their fetches can start before the
+    parser has run. The fetches go into a per load resource table that the
+    loader reads from once the parser has found the same links.
+
+    resources = ResourceTable()
+    for href in PreloadScanner().feed(body):
+        resources.preload(resolve_url(href, url))
+    nodes = HTMLParser(body).parse()
+    css = resources.get(resolve_url(link, url))
+"""
+from concurrent.futures import ThreadPoolExecutor
+import re
+
+from .connection import parse_url, request
+from .dom import parse_attributes
+from .profiling import PROFILER
+
+# subresources fetched at the same time
+PRELOAD_WORKERS = 6
+# the text of anything that could be a link tag, checked with parse_attributes
+LINK_TAG = re.compile(r"<(\s*link\b[^<>]*)>", re.IGNORECASE)
+
+
+def fetch(url):
+    """fetch a subresource
+
+    Returns:
+        str: the body
+    """
+    with PROFILER.phase("fetch", url):
+        _, body = request(parse_url(url))
+    return body
+
+
+class PreloadScanner:
+    """finds stylesheet links in html fed to it in chunks"""
+
+    def __init__(self) -> None:
+        # the start of a tag that was cut off at the end of the last chunk
+        self.pending = ""
+
+    def feed(self, chunk):
+        """scan the next chunk of html
+
+        Returns:
+            list: the hrefs of the stylesheet links completed by this chunk
+        """
+        with PROFILER.phase("preload scan"):
+            text = self.pending + chunk
+            hrefs = []
+            for match in LINK_TAG.finditer(text):
+                tag, attributes = parse_attributes(match.group(1))
+                if tag == "link" and attributes.get("rel") == "stylesheet" and "href" in attributes:
+                    hrefs.append(attributes["href"])
+            start = text.rfind("<")
+            self.pending = text[start:] if start >= 0 and ">" not in text[start:] else ""
+        return hrefs
+
+
+class ResourceTable:
+    """the subresources of one page load, fetched in parallel on a thread pool
+
+    Args:
+        fetch (callable): fetches a url and returns its body
+        workers (int): the number of fetches that can run at the same time
+    """
+
+    def __init__(self, fetch=fetch, workers=PRELOAD_WORKERS) -> None:  # pylint: disable=redefined-outer-name
+        self.fetch = fetch
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preload")
+        # url -> Future of the body
+        self.resources = {}
+
+    def __contains__(self, url):
+        return url in self.resources
+
+    def preload(self, url):
+        """start fetching url unless it has been already"""
+        if url not in self.resources:
+            self.resources[url] = self.pool.submit(self.fetch, url)
+            PROFILER.count("preloads")
+
+    def get(self, url):
+        """the body of url, waiting for its fetch
+
+        Urls the scanner missed are fetched now.
+
+        Raises:
+            Exception: whatever the fetch raised
+        """
+        if url not in self.resources:
+            PROFILER.count("preload misses")
+            self.resources[url] = self.pool.submit(self.fetch, url)
+        return self.resources[url].result()
+
+    def close(self):
+        """drop the fetches that have not started yet"""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,167 @@
+""" Per phase timing and counters for the page loading pipeline
+
+    Instrumentation is off by default. While disabled, phase() hands back a
+    shared no-op context manager and count() returns straight away, so the
+    instrumented code paths only pay for a method call. Phases also show up
+    as spans on the timeline when src.tracing is recording.
+
+    from src.profiling import PROFILER
+    PROFILER.enable()
+    browser.load(url)
+    print(PROFILER.format_report())
+"""
+from collections import defaultdict
+import threading
+import time
+
+from .tracing import TRACER
+
+PHASES = ["load", "fetch", "preload scan", "html parse", "css parse", "style", "layout", "paint", "draw", "find"]
+# the name every phase gets on a trace timeline
+TRACE_NAMES = {
+    "load": "Browser.load",
+    "fetch": "request",
+    "preload scan": "PreloadScanner.feed",
+    "html parse": "HTMLParser.parse",
+    "css parse": "CSSParser.parse",
+    "style": "Browser.style",
+    "layout": "DocumentLayout.layout",
+}
+
+
+class NullPhase:
+    """a context manager that does nothing, used while profiling is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class Phase:
+    """times one run of a phase and records it on exit"""
+
+    def __init__(self, profiler, name, resource=None) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.resource = resource
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        if self.profiler.enabled:
+            self.profiler.record(self.name, end - self.start, self.resource)
+        if TRACER.enabled:
+            args = {"url": self.resource} if self.resource else None
+            TRACER.record(TRACE_NAMES.get(self.name, self.name), self.start, end, args)
+        return False
+
+
+class Profiler:
+    """collects the time spent in every phase and a set of counters"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        # the tk thread, loader workers and preloads all record
+        self.lock = threading.Lock()
+        self.reset()
+
+    def enable(self):
+        """start collecting, dropping anything collected before"""
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        """stop collecting, the collected data stays available"""
+        self.enabled = False
+
+    def reset(self):
+        """drop everything collected so far"""
+        with self.lock:
+            # phase -> [total seconds, number of runs]
+            self.phases = defaultdict(lambda: [0.0, 0])
+            # (phase, resource, seconds) for phases that work on a resource
+            self.resources = []
+            self.counters = defaultdict(int)
+
+    def phase(self, name, resource=None):
+        """time a block of code as part of a phase
+
+        Args:
+            name (str): the phase, one of PHASES
+            resource (str): the url the phase works on, if any
+        """
+        if not self.enabled and not TRACER.enabled:
+            return NULL_PHASE
+        return Phase(self, name, resource)
+
+    def record(self, name, seconds, resource=None):
+        """add a timed run of a phase"""
+        with self.lock:
+            totals = self.phases[name]
+            totals[0] += seconds
+            totals[1] += 1
+            if resource is not None:
+                self.resources.append((name, resource, seconds))
+
+    def count(self, name, n=1):
+        """add n to a counter"""
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += n
+
+    def report(self):
+        """the collected data as a dict
+
+        Returns:
+            dict: phases (name -> {"seconds", "runs"}), resources (a list of
+                {"phase", "url", "seconds"}) and counters (name -> count)
+        """
+        with self.lock:
+            phases = {name: tuple(totals) for name, totals in self.phases.items()}
+            resources = list(self.resources)
+            counters = dict(self.counters)
+        ordered = sorted(
+            phases, key=lambda name: PHASES.index(name) if name in PHASES else len(PHASES)
+        )
+        return {
+            "phases": {
+                name: {"seconds": phases[name][0], "runs": phases[name][1]}
+                for name in ordered
+            },
+            "resources": [
+                {"phase": name, "url": url, "seconds": seconds}
+                for name, url, seconds in resources
+            ],
+            "counters": counters,
+        }
+
+    def format_report(self):
+        """the collected data as a printable table"""
+        report = self.report()
+        lines = [f"{'phase':<24}{'ms':>10}{'runs':>8}"]
+        for name, phase in report["phases"].items():
+            lines.append(f"{name:<24}{phase['seconds'] * 1000:>10.1f}{phase['runs']:>8}")
+        if report["resources"]:
+            lines.append("")
+            lines.append(f"{'resource':<64}{'ms':>10}")
+            for resource in report["resources"]:
+                url = f"{resource['phase']} {resource['url']}"
+                lines.append(f"{url[:63]:<64}{resource['seconds'] * 1000:>10.1f}")
+        if report["counters"]:
+            lines.append("")
+            lines.append(f"{'counter':<24}{'count':>10}")
+            for name, count in report["counters"].items():
+                lines.append(f"{name:<24}{count:>10}")
+        return "\n".join(lines)
+
+
+PROFILER = Profiler()
@@ -0,0 +1,386 @@
+""" A tab, the page state of one browsing context in a Browser window
+
+    Every tab has its own page, history, back-forward cache and loader.
+    Fonts with their measurement caches, the default style sheet and the
+    http cache are shared by all the tabs of a process. Only the active tab
+    draws on the window's canvas.
+"""
+import logging
+
+from .display_list import DisplayList
+from .connection import resolve_url
+from .find import Search, TextIndex
+from .history import BackForwardCache, History, rendering_size
+from .layout import DocumentLayout
+from .links import LinkIndex
+from .loader import POLL_INTERVAL_MS, Loader
+from .css import restyle
+from .profiling import PROFILER
+from .tracing import TRACER
+
+SCROLL_STEP = 100
+# find in page highlights, stippled so the text shows through
+MATCH_COLOR = "yellow"
+CURRENT_MATCH_COLOR = "orange"
+
+
+def release_background_renderings(tabs, active, budget):
+    """release the rendering of the longest hidden tabs until the hidden
+    tabs' layout trees and display lists fit in budget
+
+    Their DOMs are kept, they are laid out and painted again when shown.
+
+    Args:
+        tabs (list): the hidden tabs, the one hidden longest first
+        active (Tab): the tab on screen, never released
+        budget (int): estimated bytes
+    """
+    background = [tab for tab in tabs if tab is not active]
+    sizes = [tab.rendering_size() for tab in background]
+    total = sum(sizes)
+    for tab, size in zip(background, sizes):
+        if total <= budget:
+            break
+        if size:
+            tab.release_rendering()
+            total -= size
+
+
+class Tab:
+    """the page state of one tab
+
+    Args:
+        browser (Browser): the window the tab belongs to, layout gets its
+            fonts and size from it
+    """
+
+    log = logging.getLogger(name="root")
+
+    def __init__(self, browser) -> None:
+        self.browser = browser
+        self.nodes = None
+        self.rules = []
+        self.document = None
+        self.display_list = DisplayList()
+        self.scroll_start = 0
+        self.loader = Loader(browser)
+        # (history entry, trace, callback) of the load in flight
+        self.load_options = (None, None, None)
+        self.polling = False
+        self.history = History()
+        self.bfcache = BackForwardCache()
+        # the page on screen and its history entry
+        self.page = None
+        self.page_entry = None
+        # where the display list on screen was loaded from, links in it are
+        # relative to it, even once a navigation has left the page
+        self.base_url = None
+        # find in page, the index is built on the first search of a display list
+        self.text_index = None
+        self.search = None
+        # the links of the display list, built on the first click
+        self.link_index = None
+
+    @property
+    def active(self):
+        return self.browser.active_tab is self
+
+    @property
+    def url(self):
+        return self.history.current.url if self.history.current else None
+
+    def scroll(self, keysym):
+        """scroll the page up or down a step
+
+        Args:
+            keysym (str): "Up" or "Down"
+        """
+        if not self.document:
+            return
+        if keysym == "Down":
+            max_y = self.document.height - self.browser.height
+            self.scroll_start = min(self.scroll_start + SCROLL_STEP, max_y)
+        elif keysym == "Up" and self.scroll_start > 0:
+            self.scroll_start -= SCROLL_STEP
+        self.draw()
+
+    def click(self, x, y):
+        """follow the link at a point of the window, if there is one
+
+        Args:
+            x (int): window x
+            y (int): window y
+
+        Returns:
+            str: the url that is loaded, or None
+        """
+        if self.document is None:
+            return None
+        if self.link_index is None or self.link_index.display_list is not self.display_list:
+            self.link_index = LinkIndex(self.display_list)
+        href = self.link_index.hit(x, y + self.scroll_start)
+        if href is None:
+            return None
+        url = resolve_url(href, self.base_url)
+        self.load(url)
+        return url
+
+    def draw(self):
+        """draw the display list on the canvas, if the tab is the active one"""
+        if not self.active:
+            return
+        with PROFILER.phase("draw"):
+            canvas = self.browser.canvas
+            canvas.delete("all")
+            bottom = self.scroll_start + self.browser.height
+            for cmd in self.display_list.visible(self.scroll_start, bottom):
+                cmd.execute(self.scroll_start, canvas)
+            if self.search is not None:
+                self.draw_matches(canvas, bottom)
+
+    def draw_matches(self, canvas, bottom):
+        """highlight the matches of the search on screen"""
+        search = self.find_search(self.search.query)
+        length = len(search.query)
+        for offset in search.between(self.scroll_start, bottom):
+            color = CURRENT_MATCH_COLOR if offset == search.current else MATCH_COLOR
+            for x1, y1, x2, y2 in search.index.boxes(offset, length):
+                canvas.create_rectangle(
+                    x1, y1 - self.scroll_start, x2, y2 - self.scroll_start,
+                    fill=color, width=0, stipple="gray50",
+                )
+
+    def find_search(self, query):
+        """the search for query over the current display list
+
+        Builds the text index once per display list, and carries the current
+        match over from the previous search.
+        """
+        if self.text_index is None or self.text_index.display_list is not self.display_list:
+            self.text_index = TextIndex(self.display_list)
+            PROFILER.count("find index builds")
+        if self.search is None:
+            self.search = Search(self.text_index, query)
+            self.search.next()
+        elif self.search.query != query or self.search.index is not self.text_index:
+            self.search = self.search.narrow(query, self.text_index)
+        return self.search
+
+    def find(self, query):
+        """search the page as the query is typed, highlighting every match and
+        scrolling to the current one
+
+        Args:
+            query (str): the text in the find bar
+
+        Returns:
+            int: the number of matches
+        """
+        if self.document is None:
+            return 0
+        with PROFILER.phase("find"):
+            search = self.find_search(query)
+        self.scroll_to_match()
+        return search.count
+
+    def find_next(self):
+        """move to the next match"""
+        if self.search is not None:
+            self.find_search(self.search.query).next()
+            self.scroll_to_match()
+
+    def find_previous(self):
+        """move to the previous match"""
+        if self.search is not None:
+            self.find_search(self.search.query).previous()
+            self.scroll_to_match()
+
+    def clear_find(self):
+        """remove the highlights"""
+        if self.search is not None:
+            self.search = None
+            self.draw()
+
+    def scroll_to_match(self):
+        """scroll the current match into view, a third of the way down the
+        window, then draw"""
+        search = self.search
+        if search.current is not None:
+            index = search.index
+            top, bottom = index.line_of(search.current)
+            if top < self.scroll_start or bottom > self.scroll_start + self.browser.height:
+                max_y = max(self.document.height - self.browser.height, 0)
+                self.scroll_start = int(min(max(top - self.browser.height / 3, 0), max_y))
+        self.draw()
+
+    def update(self):
+        """bring the page up to date after DOM mutations or a resize
+
+        Only dirty subtrees are restyled, layout skips blocks that are clean and
+        did not move, and their draw commands are copied from the previous
+        display list instead of being painted again.
+        """
+        with PROFILER.phase("style"):
+            restyle(self.nodes, self.rules)
+        with PROFILER.phase("layout"):
+            self.document.layout()
+        previous = self.display_list
+        self.display_list = DisplayList(like=previous)
+        with PROFILER.phase("paint"):
+            self.document.paint(self.display_list, previous)
+        PROFILER.count("display list commands", len(self.display_list))
+        if self.page is not None:
+            self.page.width = self.browser.width
+            self.page.display_list = self.display_list
+        max_y = max(self.document.height - self.browser.height, 0)
+        self.scroll_start = min(self.scroll_start, max_y)
+        self.draw()
+
+    def rendering_size(self):
+        """the estimated bytes of the layout tree and display list"""
+        if self.document is None:
+            return 0
+        return rendering_size(self.document, self.display_list)
+
+    def release_rendering(self):
+        """drop the layout tree and display list, keeping the styled DOM"""
+        if self.document is None:
+            return
+        self.document = None
+        self.display_list = DisplayList()
+        self.text_index = self.link_index = None
+        if self.page is not None:
+            self.page.document = None
+            self.page.display_list = None
+        PROFILER.count("tab renderings released")
+
+    def rebuild_rendering(self):
+        """lay out and paint the retained DOM again after release_rendering"""
+        self.document = DocumentLayout(self.nodes, browser=self.browser)
+        with PROFILER.phase("layout"):
+            self.document.layout()
+        self.display_list = DisplayList()
+        with PROFILER.phase("paint"):
+            self.document.paint(self.display_list)
+        if self.page is not None:
+            self.page.document = self.document
+            self.page.display_list = self.display_list
+            self.page.width = self.browser.width
+        PROFILER.count("tab renderings rebuilt")
+
+    def activate(self):
+        """bring the page up to date for the window and draw it"""
+        if self.nodes is None:
+            self.browser.canvas.delete("all")
+        elif self.document is None:
+            self.rebuild_rendering()
+            self.draw()
+        elif self.page is not None and self.page.width != self.browser.width:
+            self.update()
+        else:
+            self.draw()
+
+    def load(self, url, trace=None, callback=None):
+        """start loading a url, the page is drawn once it is ready
+
+        The page is loaded on a worker thread, see src.loader, so the window
+        keeps handling events meanwhile. A load that is still in flight is
+        cancelled. The url becomes a new history entry after the current one.
+
+        Args:
+            url (URL): the url to load
+            trace (str): write a Chrome trace of this load to this path
+            callback (callable): called on the Tk thread once the page is
+                drawn or has failed to load
+        """
+        self.leave_page()
+        entry, dropped = self.history.visit(url)
+        for forward in dropped:
+            self.bfcache.discard(forward)
+        self.start_load(entry, trace, callback)
+
+    def go_back(self):
+        """go to the previous history entry"""
+        if self.history.can_go_back():
+            self.leave_page()
+            self.navigate(self.history.back())
+
+    def go_forward(self):
+        """go to the next history entry"""
+        if self.history.can_go_forward():
+            self.leave_page()
+            self.navigate(self.history.forward())
+
+    def navigate(self, entry):
+        """show a history entry, straight from the back-forward cache if it
+        is there, otherwise by loading it again"""
+        cached = self.bfcache.take(entry)
+        if cached is None:
+            self.start_load(entry)
+            return
+        self.loader.cancel()
+        PROFILER.count("bfcache hits")
+        page, scroll = cached
+        self.show(page, scroll, entry)
+
+    def leave_page(self):
+        """keep the page on screen in the back-forward cache"""
+        if self.page is not None:
+            self.bfcache.put(self.page_entry, self.page, self.scroll_start)
+        self.page = None
+
+    def start_load(self, entry, trace=None, callback=None):
+        """load a history entry on the loader's worker"""
+        if trace:
+            TRACER.start()
+        self.load_options = (entry, trace, callback)
+        self.loader.start(entry.url)
+        if not self.polling:
+            self.polling = True
+            self.browser.window.after(POLL_INTERVAL_MS, self.poll_load)
+
+    def poll_load(self):
+        """check for a finished load, rescheduling itself until there is one"""
+        result = self.loader.poll()
+        if result is None:
+            if self.loader.loading:
+                self.browser.window.after(POLL_INTERVAL_MS, self.poll_load)
+            else:
+                self.polling = False
+            return
+        self.polling = False
+        page, error = result
+        entry, trace, callback = self.load_options
+        try:
+            if error is not None:
+                self.log.error("failed to load a page: %r", error)
+            else:
+                self.show(page, 0, entry)
+        finally:
+            if trace:
+                TRACER.stop()
+                TRACER.export(trace)
+            if callback:
+                callback()
+
+    def show(self, page, scroll=0, entry=None):
+        """make a page the current one, drawing it if the tab is active
+
+        Args:
+            page (Page): the page from the loader or the back-forward cache
+            scroll (int): where to scroll to
+            entry (HistoryEntry): the page's history entry
+        """
+        self.page = page
+        self.page_entry = entry
+        self.base_url = page.url
+        self.nodes = page.nodes
+        self.rules = page.rules
+        self.document = page.document
+        self.display_list = page.display_list
+        self.scroll_start = scroll
+        self.text_index = self.search = self.link_index = None
+        if self.active:
+            # the window may have been resized since the page was laid out
+            self.activate()
+        self.browser.relieve_memory_pressure()
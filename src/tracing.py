@@ -0,0 +1,126 @@
+""" Timeline tracing of page loads in the Chrome trace event format
+
+    The exported json opens in https://ui.perfetto.dev or chrome://tracing.
+    Spans are kept as plain tuples in a bounded ring buffer, so a long
+    session keeps only the most recent events and recording stays cheap.
+    Every thread gets its own track, labelled with the thread's name.
+
+    from src.tracing import TRACER
+    TRACER.start()
+    browser.load(url)
+    TRACER.stop()
+    TRACER.export("trace.json")
+"""
+from collections import deque
+import json
+import os
+import threading
+import time
+
+DEFAULT_CAPACITY = 100_000
+
+
+class NullSpan:
+    """a context manager that does nothing, used while tracing is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    """records one complete event on exit"""
+
+    def __init__(self, tracer, name, args) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class Tracer:
+    """records nested spans from any thread into a ring buffer
+
+    Args:
+        capacity (int): the number of spans to keep, older ones are dropped
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY) -> None:
+        self.enabled = False
+        self.events = deque(maxlen=capacity)
+        self.thread_names = {}
+        # guards thread_names, threads such as preload fetches left running
+        # after their load can record while the trace is exported
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    def start(self):
+        """drop any previous events and start recording"""
+        self.events.clear()
+        with self.lock:
+            self.thread_names.clear()
+        self.origin = time.perf_counter()
+        self.enabled = True
+
+    def stop(self):
+        """stop recording, the recorded events stay available for export"""
+        self.enabled = False
+
+    def span(self, name, **args):
+        """time a block of code as a span on the current thread's track"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def record(self, name, start, end, args=None):
+        """add a span that ran from start to end, both time.perf_counter() values"""
+        thread = threading.current_thread()
+        tid = thread.ident
+        if tid not in self.thread_names:
+            with self.lock:
+                self.thread_names[tid] = thread.name
+        self.events.append((name, start, end, tid, args))
+
+    def trace_events(self):
+        """the recorded spans as a list of trace event dicts"""
+        pid = os.getpid()
+        with self.lock:
+            thread_names = dict(self.thread_names)
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in thread_names.items()
+        ]
+        for name, start, end, tid, args in list(self.events):
+            event = {
+                "name": name,
+                "ph": "X",
+                "pid": pid,
+                "tid": tid,
+                "ts": (start - self.origin) * 1e6,
+                "dur": (end - start) * 1e6,
+            }
+            if args:
+                event["args"] = args
+            events.append(event)
+        return events
+
+    def export(self, path):
+        """write the recorded spans to a json file"""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, file)
+
+
+TRACER = Tracer()
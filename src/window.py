@@ -1,62 +1,276 @@
 """ Creates a window that displays the contents of a web page
     https://browser.engineering/graphics.html
 """
-from dataclasses import dataclass
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from itertools import count
+import queue
+import threading
 import tkinter as tk
 import tkinter.font as tkfont
 import logging
 
-from src.tree_utils import tree_to_list
-from .css import INHERITED_PROPERTIES, CSSParser, cascade_priority
-from .dom import HTMLParser, Element
-from .connection import parse_url, request, resolve_url
-from .layout import DocumentLayout
+from .css import INHERITED_PROPERTIES, default_style_sheet
+from .layout_cache import LayoutCache
+from .profiling import PROFILER
+from .tab import Tab, release_background_renderings
 
 HSTEP, VSTEP = 13, 18
-SCROLL_STEP = 100
+# roughly one frame, resize events within this window are coalesced
+RESIZE_DELAY_MS = 16
+BACK_KEYS = ["<Alt-Left>", "<BackSpace>"]
+FORWARD_KEYS = ["<Alt-Right>"]
+# estimated bytes of layout trees and display lists kept for hidden tabs
+BACKGROUND_RENDERING_BUDGET = 32 * 2**20
+# (weight, slant) of the default family and size, loaded at idle time
+WARM_FONTS = [("normal", "roman"), ("bold", "roman"), ("normal", "italic")]
 
 @dataclass
 class WebFont:
     font: tkfont.Font
     whitespace: int
+    ascent: int = 0
+    descent: int = 0
+    linespace: int = 0
+    # word -> measured width
+    widths: dict = field(default_factory=dict)
+
+    def measure_all(self, words):
+        """measure a batch of words, only asking tk for words not seen before"""
+        widths = self.widths
+        measure = self.font.measure
+        cached = len(widths)
+        measured = [
+            widths[word] if word in widths else widths.setdefault(word, measure(word))
+            for word in words
+        ]
+        PROFILER.count("font.measure", len(widths) - cached)
+        return measured
     
 class Browser:
-    """A Browser window"""
+    """A Browser window with tabs
+
+    The tabs share the window's font table, and with it the measured word
+    widths and the layout cache, as well as the default style sheet and the
+    http cache.
+    """
 
-    display_list = []
-    nodes = None
-    scroll_start = 0
-    document = None
-    fonts = {}
     log = logging.getLogger(name="root")
-    
+
     def __init__(self, width, height):
         self.width = width
         self.height = height
+        # (family, size, weight, slant) -> WebFont, filled on the tk thread
+        # and read by the loader workers
+        self.fonts = {}
+        self.font_lock = threading.Lock()
+        # tk objects are made on the thread that runs the event loop, workers
+        # queue (future, function, args) for it
+        self.tk_thread = threading.current_thread()
+        self.tk_calls = queue.Queue()
+        # subtree layouts, they hold the fonts
+        self.layout_cache = LayoutCache()
+        self.tabs = []
+        self.active_tab = None
+        # tab -> when it was last active, to release the longest hidden first
+        self.last_active = {}
+        self.activations = count()
         self.window = tk.Tk()
         self.window.title("Browser")
         self.window.bind("<Down>", self.scroll)
         self.window.bind("<Up>", self.scroll)
+        self.window.bind("<Configure>", self.resize)
+        for key in BACK_KEYS:
+            self.window.bind(key, self.go_back)
+        for key in FORWARD_KEYS:
+            self.window.bind(key, self.go_forward)
+        self.window.bind("<Control-t>", self.duplicate_tab)
+        self.window.bind("<Control-w>", self.close_active_tab)
+        self.window.bind("<Control-Tab>", self.next_tab)
+        # tk names the shifted tab key ISO_Left_Tab on X11
+        for key in ["<Control-Shift-Tab>", "<Control-ISO_Left_Tab>"]:
+            try:
+                self.window.bind(key, self.previous_tab)
+            except tk.TclError:
+                continue
+        self.window.bind("<Control-f>", self.open_find_bar)
+        self.window.bind("<<TkCalls>>", self.run_tk_calls)
+        self.pending_size = None
         self.canvas = tk.Canvas(self.window, width=width, height=height, bg="white")
-        self.canvas.pack()
-        with open("src/browser.css", "r", encoding="utf-8") as file:
-            self.default_style_sheet = CSSParser(file.read()).parse()
+        self.canvas.pack(fill="both", expand=True)
+        self.canvas.bind("<Button-1>", self.click)
+        # the find bar, shown under the page by Control-f
+        self.find_text = tk.StringVar(self.window)
+        self.find_bar = tk.Entry(self.window, textvariable=self.find_text)
+        self.find_text.trace_add("write", self.find_changed)
+        self.find_bar.bind("<Return>", self.find_next)
+        self.find_bar.bind("<Shift-Return>", self.find_previous)
+        self.find_bar.bind("<Escape>", self.close_find_bar)
+        # the window shows first, anything else that is slow waits for idle time
+        self.window.after_idle(self.warm_up)
+
+    def warm_up(self):
+        """compile the default style sheet and load the default fonts
+
+        Both happen on first use anyway, doing them while the window is idle
+        takes them off the first page load.
+        """
+        default_style_sheet()
+        size = int(float(INHERITED_PROPERTIES["font-size"][:-2]) * 0.75)
+        for weight, slant in WARM_FONTS:
+            self.get_font(INHERITED_PROPERTIES["font-family"], size, weight, slant)
+
+    def new_tab(self, url=None):
+        """open a tab after the active one and switch to it
+
+        Args:
+            url (str): load this url in the new tab
+
+        Returns:
+            Tab: the new tab
+        """
+        tab = Tab(self)
+        position = self.tabs.index(self.active_tab) + 1 if self.active_tab else len(self.tabs)
+        self.tabs.insert(position, tab)
+        self.switch_tab(tab)
+        if url:
+            tab.load(url)
+        return tab
+
+    def switch_tab(self, tab):
+        """make a tab the active one and draw it"""
+        if self.active_tab is not None and self.active_tab is not tab:
+            self.close_find_bar()
+        self.active_tab = tab
+        self.last_active[tab] = next(self.activations)
+        self.update_title()
+        tab.activate()
+        self.relieve_memory_pressure()
+
+    def close_tab(self, tab):
+        """close a tab, the window closes with its last tab"""
+        tab.loader.cancel()
+        index = self.tabs.index(tab)
+        self.tabs.remove(tab)
+        self.last_active.pop(tab, None)
+        if not self.tabs:
+            self.window.destroy()
+        elif tab is self.active_tab:
+            self.switch_tab(self.tabs[min(index, len(self.tabs) - 1)])
+
+    def duplicate_tab(self, event=None):
+        self.new_tab(self.active_tab.url if self.active_tab else None)
+
+    def close_active_tab(self, event=None):
+        if self.active_tab:
+            self.close_tab(self.active_tab)
+
+    def next_tab(self, event=None):
+        self.cycle_tab(1)
+
+    def previous_tab(self, event=None):
+        self.cycle_tab(-1)
+
+    def cycle_tab(self, step):
+        if len(self.tabs) > 1:
+            index = self.tabs.index(self.active_tab)
+            self.switch_tab(self.tabs[(index + step) % len(self.tabs)])
+
+    def update_title(self):
+        index = self.tabs.index(self.active_tab) + 1
+        url = self.active_tab.url or ""
+        self.window.title(f"Browser [{index}/{len(self.tabs)}] {url}")
+
+    def relieve_memory_pressure(self):
+        """release the rendering of hidden tabs, longest hidden first, once
+        they take more than BACKGROUND_RENDERING_BUDGET"""
+        hidden = sorted(self.tabs, key=lambda tab: self.last_active.get(tab, -1))
+        release_background_renderings(hidden, self.active_tab, BACKGROUND_RENDERING_BUDGET)
 
     def scroll(self, event):
-        """scroll the display list
+        """scroll the active tab
 
         Args:
             event (dict): a Tkinter window event
         """
-        if event.keysym == "Down":
-            max_y = self.document.height - self.height
-            self.scroll_start = min(self.scroll_start + SCROLL_STEP, max_y)
-        elif event.keysym == "Up" and self.scroll_start > 0:
-            self.scroll_start -= SCROLL_STEP
-        self.draw()
+        if self.active_tab:
+            self.active_tab.scroll(event.keysym)
+
+    def click(self, event):
+        """follow the link under the mouse in the active tab"""
+        if self.active_tab and self.active_tab.click(event.x, event.y):
+            self.update_title()
+
+    def go_back(self, event=None):
+        # backspace deletes in the find bar
+        if event is not None and event.widget is self.find_bar:
+            return
+        if self.active_tab:
+            self.active_tab.go_back()
+            self.update_title()
+
+    def go_forward(self, event=None):
+        if self.active_tab:
+            self.active_tab.go_forward()
+            self.update_title()
+
+    def open_find_bar(self, event=None):
+        """show the find bar and search the active tab for its text"""
+        if not self.find_bar.winfo_ismapped():
+            self.find_bar.pack(side="bottom", fill="x", before=self.canvas)
+        self.find_bar.focus_set()
+        self.find_bar.select_range(0, "end")
+        self.find_changed()
+
+    def close_find_bar(self, event=None):
+        """hide the find bar and the highlights"""
+        if self.find_bar.winfo_ismapped():
+            self.find_bar.pack_forget()
+            self.window.focus_set()
+        if self.active_tab:
+            self.active_tab.clear_find()
+
+    def find_changed(self, *args):
+        """search the active tab as the find bar's text is typed"""
+        if self.active_tab:
+            matches = self.active_tab.find(self.find_text.get())
+            self.find_bar.configure(bg="white" if matches or not self.find_text.get() else "pink")
+
+    def find_next(self, event=None):
+        if self.active_tab:
+            self.active_tab.find_next()
+
+    def find_previous(self, event=None):
+        if self.active_tab:
+            self.active_tab.find_previous()
+
+    def resize(self, event):
+        """schedule a relayout when the window size changes
+
+        Resize events arrive in bursts while the window is dragged, so they are
+        debounced and at most one layout runs per frame.
+
+        Args:
+            event (dict): a Tkinter configure event
+        """
+        if event.widget is not self.window:
+            return
+        if self.pending_size is None:
+            self.window.after(RESIZE_DELAY_MS, self.apply_resize)
+        self.pending_size = (event.width, event.height)
+
+    def apply_resize(self):
+        """relayout the active tab for the latest pending window size,
+        background tabs are relaid out when they are shown"""
+        size, self.pending_size = self.pending_size, None
+        if size == (self.width, self.height):
+            return
+        self.width, self.height = size
+        if self.active_tab and self.active_tab.document:
+            self.active_tab.update()
     
     def get_font(self, family: str, size: int, weight: str, slant: str) -> WebFont:
-        """_summary_
+        """the font for a style, made on the tk thread the first time
 
         Args:
             family (str): The font family
@@ -68,89 +282,68 @@ class Browser:
             font: a font object
         """
         key = (family, size, weight, slant)
-        if key not in self.fonts:
-            font = tkfont.Font(
-                family=family,
-                size=size,
-                weight=weight,
-                slant=slant,
-            )
-            # create a dummy widget to load the font into tk for performance
-            tk.Label(self.window, text=" ", font=font)
-            self.fonts[key] = WebFont(font, whitespace=font.measure(" "))
-        return self.fonts[key]
-    
-    def draw(self):
-        """draw the display list on the canvas"""
-        self.canvas.delete("all")
-        for cmd in self.display_list:
-            if cmd.top > self.scroll_start + self.height:
-                continue
-            if cmd.bottom < self.scroll_start:
-                continue
-            cmd.execute(self.scroll_start, self.canvas)
-
-    def style(self,node, rules):
-        """parse the style attribute of a node"""
-        node.style = {}
-        # inherit from parent before applying explicit styles
-        for prop, default_value in INHERITED_PROPERTIES.items():
-            if node.parent:
-                node.style[prop] = node.parent.style.get(prop, default_value)
-            else:
-                node.style[prop] = default_value
-        if isinstance(node, Element) and "style" in node.attributes:
-            pairs = CSSParser(node.attributes["style"]).body()
-            for prop,val in pairs.items():
-                node.style[prop] = val
-        for selector, body in rules:
-            if not selector.matches(node):
-                continue
-            
-            for prop, value in body.items():
-                node.style[prop] = value
-        if node.style["font-size"].endswith("%"):
-            if node.parent:
-                parent_font_size = node.parent.style["font-size"]
-            else:
-                parent_font_size = INHERITED_PROPERTIES["font-size"]
-            # everything but the %
-            node_pct = float(node.style["font-size"][:-1]) / 100
-            # everything but the px
-            parent_px = float(parent_font_size[:-2])
-            # convert to a fixed value
-            node.style["font-size"] = str(node_pct * parent_px) + "px"
-        for child in node.children:
-            self.style(child, rules)
-            
-    def load(self, url):
-        """load a url into the browser
+        with self.font_lock:
+            font = self.fonts.get(key)
+        if font is None:
+            font = self.call_on_tk_thread(self.make_font, key)
+        return font
 
-        Args:
-            url (URL): the url to load
+    def make_font(self, key):
+        """create a font and take its metrics, only called on the tk thread"""
+        with self.font_lock:
+            if key in self.fonts:
+                # another worker asked for it first
+                return self.fonts[key]
+        family, size, weight, slant = key
+        font = tkfont.Font(
+            family=family,
+            size=size,
+            weight=weight,
+            slant=slant,
+        )
+        metrics = font.metrics()
+        PROFILER.count("font.measure")
+        web_font = WebFont(
+            font,
+            whitespace=font.measure(" "),
+            ascent=metrics["ascent"],
+            descent=metrics["descent"],
+            linespace=metrics["linespace"],
+        )
+        with self.font_lock:
+            self.fonts[key] = web_font
+        return web_font
+
+    def call_on_tk_thread(self, function, *args):
+        """run a function on the tk thread and wait for its result
+
+        From a worker, this waits until the event loop gets to it.
         """
-        parsed_url = parse_url(url)
-        _, body = request(parsed_url)
-        self.nodes = HTMLParser(body).parse()
-
-        # CSS
-        rules = self.default_style_sheet.copy()
-        links = [ node.attributes["href"] for node in tree_to_list(self.nodes, []) 
-                 if isinstance(node, Element)
-                 and node.tag == "link"
-                 and "href" in node.attributes
-                 and node.attributes.get("rel") == "stylesheet"]
-        for link in links:
+        if threading.current_thread() is self.tk_thread:
+            return function(*args)
+        future = Future()
+        self.tk_calls.put((future, function, args))
+        self.window.event_generate("<<TkCalls>>", when="tail")
+        return future.result()
+
+    def run_tk_calls(self, event=None):
+        """run the calls workers queued for the tk thread"""
+        while True:
             try:
-                _, body = request(parse_url(resolve_url(link,url)))
-            except:
-                continue
-            rules.extend(CSSParser(body).parse())
-        self.style(self.nodes, sorted(rules,key=cascade_priority))
-        # Layout
-        
-        self.document = DocumentLayout(self.nodes, browser=self)
-        self.document.layout()
-        self.display_list = []
-        self.document.paint(self.display_list)
-        self.draw()
+                future, function, args = self.tk_calls.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                future.set_result(function(*args))
+            except Exception as error:  # pylint: disable=broad-except
+                future.set_exception(error)
+
+    def load(self, url, trace=None, callback=None):
+        """load a url in the active tab, opening one if there is none
+
+        See Tab.load for the arguments.
+        """
+        if self.active_tab is None:
+            self.new_tab()
+        self.active_tab.load(url, trace, callback)
+        self.update_title()
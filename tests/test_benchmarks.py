@@ -0,0 +1,77 @@
+from benchmarks.compare import compare
+from benchmarks.corpus import CorpusConfig, generate_css, generate_html
+from benchmarks.load import drive, percentile
+from benchmarks.loopback import LoopbackServer
+from benchmarks.run import run
+from benchmarks.startup import start_once
+from src.css import CSSParser, DescendantSelector
+from src.dom import HTMLParser
+from src.tree_utils import tree_to_list
+
+
+### corpus tests
+def test_corpus_is_deterministic():
+    config = CorpusConfig(depth=2, breadth=3, words=10, rules=20)
+    assert generate_html(config) == generate_html(config)
+    assert generate_css(config) == generate_css(config)
+    assert generate_html(config) != generate_html(CorpusConfig(seed=1, depth=2, breadth=3, words=10))
+
+
+def test_corpus_shape():
+    config = CorpusConfig(depth=2, breadth=3, words=10, rules=50, descendant_density=1.0)
+    nodes = tree_to_list(HTMLParser(generate_html(config)).parse(), [])
+    # every leaf block is a paragraph
+    assert len([node for node in nodes if getattr(node, "tag", None) == "p"]) >= 9
+    rules = CSSParser(generate_css(config)).parse()
+    assert len(rules) == 50
+    assert all(isinstance(selector, DescendantSelector) for selector, _ in rules)
+
+
+### run and compare tests
+def test_run_times_every_phase():
+    results = run(CorpusConfig(depth=2, breadth=2, words=20, rules=10), repeat=1)
+    assert list(results["phases"]) == ["html parse", "css parse", "style", "layout", "layout cached", "paint"]
+    assert results["counts"]["display list commands"] > 0
+    assert results["config"]["depth"] == 2
+
+
+def test_compare_flags_regressions():
+    baseline = {"phases": {"layout": {"median": 1.0}, "paint": {"median": 1.0}}}
+    results = {"phases": {"layout": {"median": 1.05}, "paint": {"median": 1.5}}}
+    rows = compare(baseline, results, threshold=0.1)
+    assert [(name, regressed) for name, *_, regressed in rows] == [
+        ("layout", False), ("paint", True)
+    ]
+
+
+### load tests
+def test_percentile():
+    values = list(range(101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) is None
+
+
+def test_drive():
+    with LoopbackServer() as server:
+        results = drive(server.url("/bytes/1000"), requests=8, concurrency=2)
+        assert server.requests == 8
+    assert results["ok"] == 8
+    assert not results["errors"]
+    assert results["bytes per second"] > 0
+    assert results["latency"]["p50"] <= results["latency"]["max"]
+
+
+def test_drive_counts_errors():
+    with LoopbackServer() as server:
+        results = drive(server.url("/bytes/1000?chunked"), requests=4, concurrency=2)
+    assert results["ok"] == 0
+    assert results["errors"] == {"AssertionError": 4}
+
+
+### startup tests
+def test_startup_marks(tmp_path):
+    timings = start_once(tmp_path)
+    # without a display only the imports are timed
+    assert timings["imports"] > 0
+    assert "first window" in timings or "error" in timings
@@ -0,0 +1,57 @@
+from src.box_tree import build_box_tree
+from src.dom import Element, HTMLParser, Text
+
+
+def parse(body):
+    nodes = HTMLParser(f"<html><body>{body}</body></html>").parse()
+    return nodes, nodes.children[0]
+
+
+def describe(box):
+    if box.inlines:
+        kind = "anonymous" if box.anonymous else box.node.tag
+        return (kind, [getattr(node, "tag", None) or node.text for node in box.inlines])
+    return (box.node.tag, [describe(child) for child in box.children])
+
+
+def test_block_and_inline_containers():
+    nodes, _ = parse("<div><p>hello <b>world</b></p><p></p></div>")
+    box = build_box_tree(nodes)
+    assert describe(box) == (
+        "html", [("body", [("div", [("p", ["p"]), ("p", [])])])]
+    )
+
+
+def test_inline_runs_are_wrapped_in_anonymous_blocks():
+    nodes, body = parse("<div>one <b>two</b><p>three</p>four</div>")
+    box = build_box_tree(nodes)
+    div = box.children[0].children[0]
+    assert describe(div) == (
+        "div", [("anonymous", ["one ", "b"]), ("p", ["p"]), ("anonymous", ["four"])]
+    )
+    assert all(child.node is div.node for child in div.children if child.anonymous)
+
+
+def test_clean_subtrees_keep_their_boxes():
+    nodes, body = parse("<div><p>a</p></div><section><p>b</p></section>")
+    box = build_box_tree(nodes)
+    div, section = box.children[0].children
+    for node in [nodes, body, *body.children]:
+        node.layout_dirty = node.descendant_dirty = False
+    p = Element("p", {})
+    p.append_child(Text("c"))
+    section.node.append_child(p)
+    assert build_box_tree(nodes, box) is box
+    assert box.children[0].children == [div, section]
+    assert [child.node for child in section.children][-1] is p
+
+
+def test_element_becomes_block_container():
+    nodes, body = parse("<div>text</div>")
+    box = build_box_tree(nodes)
+    div = box.children[0].children[0]
+    assert div.inlines == (body.children[0],)
+    body.children[0].append_child(Element("p", {}))
+    build_box_tree(nodes, box)
+    assert div.inlines == ()
+    assert describe(div) == ("div", [("anonymous", ["text"]), ("p", [])])
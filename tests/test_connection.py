@@ -1,5 +1,33 @@
+import gzip
+import http.client
+import io
+import shutil
+import socket
+import time
+
 import pytest
-from src.connection import parse_url
+from benchmarks.loopback import LoopbackServer
+from src.connection import (
+    CONNECTIONS,
+    Connection,
+    MAX_REDIRECTS,
+    HTTPCache,
+    HTTPResponse,
+    Status,
+    MappedText,
+    PERMANENT_REDIRECTS,
+    RedirectCache,
+    TooManyRedirects,
+    charset_of,
+    decode,
+    freshness_lifetime,
+    get_page,
+    parse_url,
+    read_body,
+    request,
+    request_chunks,
+    resolve_url,
+)
 
 def test_parse_url_http():
     url = "http://www.example.com/path/to/resource"
@@ -36,4 +64,275 @@ def test_parse_url_no_path():
 def test_parse_url_invalid_url():
     with pytest.raises(ValueError):
         parse_url("not a url")
-        
\ No newline at end of file
+        
+def test_request_loopback():
+    with LoopbackServer({"/index.html": b"<p>hello</p>"}) as server:
+        response, body = request(parse_url(server.url("/index.html")))
+    assert response.status.code == "200"
+    assert body == "<p>hello</p>"
+    assert server.requests == 1
+
+def test_request_loopback_not_found():
+    with LoopbackServer() as server:
+        with pytest.raises(AssertionError):
+            request(parse_url(server.url("/missing")))
+
+def test_request_loopback_latency():
+    with LoopbackServer(latency=0.05) as server:
+        start = time.perf_counter()
+        request(parse_url(server.url("/bytes/10")))
+        assert time.perf_counter() - start >= 0.05
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="needs openssl")
+def test_request_loopback_tls():
+    with LoopbackServer(tls=True) as server:
+        _, body = request(parse_url(server.url("/bytes/100")), server.client_context())
+    assert len(body) == 100
+
+@pytest.mark.parametrize("query", ["?chunked", "?gzip", "?chunked&gzip"])
+def test_loopback_encodings(query):
+    with LoopbackServer() as server:
+        connection = http.client.HTTPConnection("localhost", server.port)
+        connection.request("GET", "/bytes/50000" + query)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+    if "gzip" in query:
+        assert response.getheader("Content-Encoding") == "gzip"
+        body = gzip.decompress(body)
+    assert body == b"<p>" + b"x" * 49997
+
+def test_request_reuses_connections():
+    CONNECTIONS.close_all()
+    with LoopbackServer() as server:
+        for size in [10, 0, 100000]:
+            _, body = request(parse_url(server.url(f"/bytes/{size}")))
+            assert len(body) == size
+        assert server.requests == 3
+        assert server.connections == 1
+    CONNECTIONS.close_all()
+
+def test_request_retries_a_stale_connection():
+    CONNECTIONS.close_all()
+    with LoopbackServer() as server:
+        url = parse_url(server.url("/bytes/10"))
+        request(url)
+        # the connection dies while it is idle in the pool
+        for connection in CONNECTIONS.idle[("http", url.host, url.port, None)]:
+            connection.sock.shutdown(socket.SHUT_RDWR)
+        _, body = request(url)
+        assert len(body) == 10
+        assert server.connections == 2
+    CONNECTIONS.close_all()
+
+def test_connections_are_pooled_by_ssl_context():
+    CONNECTIONS.close_all()
+    with LoopbackServer(tls=True) as server:
+        url = parse_url(server.url("/bytes/10"))
+        context = server.client_context()
+        request(url, context)
+        request(url, context)
+        assert server.connections == 1
+        request(url, server.client_context())
+        assert server.connections == 2
+    CONNECTIONS.close_all()
+
+
+@pytest.mark.parametrize("status", ["204 No Content", "304 Not Modified", "103 Early Hints"])
+def test_responses_without_a_body(status):
+    client, server = socket.socketpair()
+    with client, server:
+        connection = Connection.__new__(Connection)
+        connection.sock = client
+        connection.reader = client.makefile("rb")
+        # the server keeps the connection open, reading to the end would hang
+        server.sendall(f"HTTP/1.1 {status}\r\n\r\n".encode())
+        server.settimeout(5)
+        client.settimeout(5)
+        response, body = get_page(connection, parse_url("http://example.org/"))
+        assert body == b"" and str(response.status) == status
+        assert connection.reusable == (not status.startswith("1"))
+        connection.reader.close()
+
+
+def test_reused_connection_closed_on_a_bad_response():
+    CONNECTIONS.close_all()
+    with LoopbackServer() as server:
+        request(parse_url(server.url("/bytes/10")))
+        url = parse_url(server.url("/bytes/10?chunked"))
+        connection, = CONNECTIONS.idle[("http", url.host, url.port, None)]
+        with pytest.raises(AssertionError):
+            request(url)
+        assert connection.sock.fileno() == -1
+    CONNECTIONS.close_all()
+
+
+def test_read_body_reads_exactly_the_content_length():
+    reader = io.BufferedReader(io.BytesIO(b"0123456789next response"), buffer_size=4)
+    assert read_body(reader, 10) == b"0123456789"
+    assert reader.read() == b"next response"
+
+def test_read_body_short():
+    with pytest.raises(ConnectionError):
+        read_body(io.BytesIO(b"0123"), 10)
+
+@pytest.mark.parametrize("body, headers, expected", [
+    ("héllo".encode("utf-8"), {}, "héllo"),
+    ("héllo".encode("latin-1"), {"content-type": "text/html; charset=ISO-8859-1"}, "héllo"),
+    ("héllo".encode("latin-1"), {"content-type": "text/html; charset=\"latin-1\""}, "héllo"),
+    ('<meta charset="windows-1252"><p>é'.encode("cp1252"), {}, '<meta charset="windows-1252"><p>é'),
+    ('<meta http-equiv="Content-Type" content="text/html; charset=koi8-r">ж'.encode("koi8-r"), {},
+     '<meta http-equiv="Content-Type" content="text/html; charset=koi8-r">ж'),
+    ('@charset "latin-1"; p { content: "é" }'.encode("latin-1"), {}, '@charset "latin-1"; p { content: "é" }'),
+    (b"\xef\xbb\xbfhi", {"content-type": "text/html; charset=latin-1"}, "hi"),
+    (b"\xff\xfe" + "hé".encode("utf-16-le"), {}, "hé"),
+    ("héllo".encode("utf-8"), {"content-type": "text/html; charset=bogus"}, "héllo"),
+])
+def test_decode(body, headers, expected):
+    assert decode(body, headers) == expected
+
+def test_charset_of():
+    assert charset_of({"content-type": "text/css;Charset=UTF-8"}) == "UTF-8"
+    assert charset_of({"content-type": "text/html"}) is None
+    assert charset_of({}) is None
+
+REDIRECTS = {
+    "/old": (301, "/new"),
+    "/moved": (302, "dir/page"),
+    "/dir/page": (307, "../new"),
+    "/loop": (302, "/loop"),
+    "/file": (302, "file:///etc/passwd"),
+}
+
+def test_url_str():
+    for url in ["http://example.com/a", "https://example.com:8443/a?b", "file://tests/x.html"]:
+        assert str(parse_url(url)) == url
+    assert str(parse_url("https://example.com:443/")) == "https://example.com/"
+
+def test_request_follows_redirects():
+    CONNECTIONS.close_all()
+    PERMANENT_REDIRECTS.clear()
+    with LoopbackServer({"/new": b"new"}, redirects=REDIRECTS) as server:
+        response, body = request(parse_url(server.url("/moved")))
+        assert body == "new"
+        assert response.url == server.url("/new")
+        assert server.requests == 3
+        # every hop went over the same kept alive connection
+        assert server.connections == 1
+    CONNECTIONS.close_all()
+
+def test_request_caches_permanent_redirects():
+    PERMANENT_REDIRECTS.clear()
+    with LoopbackServer({"/new": b"new"}, redirects=REDIRECTS) as server:
+        for _ in range(3):
+            _, body = request(parse_url(server.url("/old")))
+            assert body == "new"
+        assert server.requests == 4
+        # temporary redirects are followed every time
+        request(parse_url(server.url("/moved")))
+        request(parse_url(server.url("/moved")))
+        assert server.requests == 4 + 6
+
+def test_request_redirect_limit():
+    with LoopbackServer(redirects=REDIRECTS) as server:
+        with pytest.raises(TooManyRedirects):
+            request(parse_url(server.url("/loop")))
+        assert server.requests == MAX_REDIRECTS + 1
+        with pytest.raises(ValueError):
+            request(parse_url(server.url("/file")))
+
+def test_redirect_cache_is_bounded():
+    cache = RedirectCache(capacity=2)
+    cache.add("a", "1")
+    cache.add("b", "2")
+    assert cache.get("a") == "1"
+    cache.add("c", "3")
+    # b was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+def test_parse_url_data():
+    url = parse_url("data:text/html;base64,PHA+aGk8L3A+")
+    assert url.scheme == "data"
+    assert url.path == "text/html;base64,PHA+aGk8L3A+"
+    assert str(url) == "data:text/html;base64,PHA+aGk8L3A+"
+    assert resolve_url("data:text/css,p{}", "http://example.com/a/b.html") == "data:text/css,p{}"
+
+@pytest.mark.parametrize("url, expected", [
+    ("data:text/html;base64,PHA+aGk8L3A+", "<p>hi</p>"),
+    ("data:text/html,%3Cp%3Ehi%20there%3C%2Fp%3E", "<p>hi there</p>"),
+    ("data:,plain%20text", "plain text"),
+    ("data:text/html;charset=latin-1,caf%E9", "café"),
+    ("data:text/html;charset=utf-8;base64,Y2Fmw6k=", "café"),
+])
+def test_request_data_url(url, expected):
+    response, body = request(parse_url(url))
+    assert response is None
+    assert body == expected
+
+def test_request_file(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text("<p>héllo</p>", encoding="utf-8")
+    _, body = request(parse_url(f"file://{path}"))
+    assert body == "<p>héllo</p>"
+
+def test_mapped_text_chunks(tmp_path):
+    text = "<p>" + "ééé wörds 𝄞 " * 1000 + "</p>"
+    path = tmp_path / "page.html"
+    path.write_bytes(b"\xef\xbb\xbf" + text.encode("utf-8"))
+    # the chunk size splits multibyte characters
+    chunks = list(MappedText(str(path), chunk_size=7))
+    assert "".join(chunks) == text
+    assert MappedText(str(path)).read() == text
+
+def test_mapped_text_declared_charset(tmp_path):
+    text = '<meta charset="latin-1"><p>café</p>'
+    path = tmp_path / "page.html"
+    path.write_bytes(text.encode("latin-1"))
+    assert "".join(MappedText(str(path), chunk_size=4)) == text
+
+def test_mapped_text_empty_file(tmp_path):
+    path = tmp_path / "empty.html"
+    path.write_bytes(b"")
+    assert list(MappedText(str(path))) == []
+    assert MappedText(str(path)).read() == ""
+
+def test_request_chunks_file(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text("<p>hi</p>", encoding="utf-8")
+    response, chunks = request_chunks(parse_url(f"file://{path}"))
+    assert response is None
+    assert "".join(chunks) == "<p>hi</p>"
+
+@pytest.mark.parametrize("cache_control, lifetime", [
+    ("", 0),
+    ("max-age=60", 60),
+    ("public, max-age=10", 10),
+    ("max-age=60, no-store", 0),
+    ("no-cache", 0),
+])
+def test_freshness_lifetime(cache_control, lifetime):
+    assert freshness_lifetime({"cache-control": cache_control}) == lifetime
+
+def test_http_cache(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = HTTPCache(budget=10)
+    fresh = HTTPResponse("HTTP/1.1", Status("200", "OK"), {"cache-control": "max-age=5"})
+    cache.put("a", fresh, b"1234")
+    cache.put("b", HTTPResponse("HTTP/1.1", Status("200", "OK"), {}), b"1234")
+    assert cache.get("a") == (fresh, b"1234")
+    assert cache.get("b") is None
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.size == 0
+
+def test_http_cache_budget():
+    cache = HTTPCache(budget=10)
+    fresh = HTTPResponse("HTTP/1.1", Status("200", "OK"), {"cache-control": "max-age=60"})
+    for url in "abc":
+        cache.put(url, fresh, b"1234")
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+    assert cache.size == 8
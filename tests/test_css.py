@@ -1,5 +1,5 @@
-from src.css import CSSParser, TagSelector, DescendantSelector
-from src.dom import Element
+from src.css import CSSParser, TagSelector, DescendantSelector, cascade_priority, default_style_sheet, restyle, style
+from src.dom import Element, HTMLParser
 
 
 def test_tag_selector_matches():
@@ -44,3 +44,32 @@ def test_css_parser():
     assert selector.ancestor.tag == "div"
     assert selector.descendant.tag == "p"
     assert body == {"color": "red"}
+
+
+def test_style_inherits_and_applies_rules():
+    root = HTMLParser("<html><body><div><p>hello</p></div></body></html>").parse()
+    rules = sorted(CSSParser("p { color: red; } div { font-size: 200%; }").parse(), key=cascade_priority)
+    style(root, rules)
+    div = root.children[0].children[0]
+    p = div.children[0]
+    assert p.style["color"] == "red"
+    assert div.style["font-size"] == "28.0px"
+    assert p.children[0].style["font-size"] == "28.0px"
+    assert not p.style_dirty
+
+
+def test_restyle_only_touches_dirty_subtrees():
+    root = HTMLParser("<html><body><p>hello</p><p>world</p></body></html>").parse()
+    style(root, [])
+    first, second = root.children[0].children
+    untouched = second.style
+    first.set_attribute("style", "color:green;")
+    restyle(root, [])
+    assert first.style["color"] == "green"
+    assert second.style is untouched
+
+
+def test_default_style_sheet_is_parsed_once():
+    rules = default_style_sheet()
+    assert rules
+    assert default_style_sheet() is rules
@@ -0,0 +1,77 @@
+from src.display_list import DisplayList
+from src.layout import DrawRect, DrawText
+
+
+### utility func
+def sample():
+    display_list = DisplayList()
+    display_list.add_rect(0, 0, 100, 50, "gray")
+    display_list.add_texts(
+        [10, 40], [5, 5], ["hello", "wörld"], [28, 30], ["font"] * 2, ["black", "red"], [13, 13]
+    )
+    display_list.add_texts([10], [60], ["again"], [30], ["font"], ["black"], [13])
+    return display_list
+
+
+### DisplayList tests
+def test_commands_round_trip():
+    display_list = sample()
+    assert len(display_list) == 4
+    rect, hello, world, again = display_list
+    assert isinstance(rect, DrawRect)
+    assert (rect.left, rect.top, rect.right, rect.bottom, rect.color) == (0, 0, 100, 50, "gray")
+    assert isinstance(hello, DrawText)
+    assert (hello.left, hello.top, hello.bottom, hello.text) == (10, 5, 18, "hello")
+    assert (world.text, world.color) == ("wörld", "red")
+    assert display_list[-1].text == "again"
+    assert list(display_list.rights[1:3]) == [38, 70]
+
+
+def test_fonts_and_colors_are_interned():
+    display_list = sample()
+    assert len(display_list.fonts) == 1
+    assert display_list.colors.values == ["gray", "black", "red"]
+
+
+def test_equal_strings_share_an_id_across_repaints():
+    previous = sample()
+    for _ in range(3):
+        # a restyle makes new but equal color and href strings
+        display_list = DisplayList(like=previous)
+        display_list.add_rect(0, 0, 1, 1, "".join(["gr", "ay"]))
+        display_list.add_texts(
+            [0], [0], ["x"], [5], [previous.fonts.values[0]], ["".join(["r", "ed"])], [8],
+            ["".join(["/", "x"])],
+        )
+        previous = display_list
+    assert previous.colors.values == ["gray", "black", "red"]
+    assert previous.links.values == [None, "/x"]
+
+
+def test_slice():
+    display_list = sample()
+    sliced = display_list[2:4]
+    assert [cmd.text for cmd in sliced] == ["wörld", "again"]
+    assert sliced.fonts is display_list.fonts
+
+
+def test_extend_remaps_ids_between_tables():
+    display_list = DisplayList()
+    display_list.add_rect(0, 0, 1, 1, "red")
+    display_list.extend(sample(), 1, 3)
+    assert [cmd.color for cmd in display_list] == ["red", "black", "red"]
+    assert [cmd.text for cmd in display_list[1:]] == ["hello", "wörld"]
+
+
+def test_extend_with_shared_tables():
+    first = sample()
+    second = DisplayList(like=first)
+    second.extend(first, 3)
+    second.extend(first, 0, 2)
+    assert second.fonts is first.fonts
+    assert [getattr(cmd, "text", None) for cmd in second] == ["again", None, "hello"]
+
+
+def test_visible():
+    visible = sample().visible(20, 100)
+    assert [getattr(cmd, "text", None) for cmd in visible] == [None, "again"]
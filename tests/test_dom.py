@@ -47,4 +47,69 @@ def test_html_parser_multiple_tags():
     assert result.children[1].tag == "p"
     assert len(result.children[1].children) == 1
     assert isinstance(result.children[1].children[0], Text)
-    assert result.children[1].children[0].text == "world"
\ No newline at end of file
+    assert result.children[1].children[0].text == "world"
+
+def test_html_parser_feed_in_chunks():
+    html = add_implicit_tags('<p class="x">hello <b>big</b> world</p><p>again</p>')
+    expected = get_body(HTMLParser(html).parse())
+    for size in [1, 2, 3, 7]:
+        parser = HTMLParser()
+        for i in range(0, len(html), size):
+            parser.feed(html[i : i + size])
+        body = get_body(parser.close())
+        assert [p.attributes for p in body.children] == [p.attributes for p in expected.children]
+        assert [c.text for c in body.children[0].children if isinstance(c, Text)] == ["hello ", " world"]
+        assert body.children[0].children[1].tag == "b"
+        assert body.children[1].children[0].text == "again"
+
+### mutation tests
+def test_set_text_marks_ancestors_dirty():
+    root = HTMLParser(add_implicit_tags("<p>hello</p><p>world</p>")).parse()
+    body = get_body(root)
+    for node in [root, body] + body.children:
+        node.layout_dirty = node.descendant_dirty = False
+    text = body.children[0].children[0]
+    text.set_text("goodbye")
+    assert text.text == "goodbye"
+    assert text.layout_dirty
+    assert body.children[0].descendant_dirty
+    assert body.descendant_dirty and root.descendant_dirty
+    assert not body.children[1].descendant_dirty
+
+
+def test_text_words_are_decoded_interned_and_cached():
+    first, second = Text("fish &amp; chips"), Text("  " + "".join(["fi", "sh"]) + "\n")
+    assert first.words == ("fish", "&", "chips")
+    assert first.words is first.words
+    assert second.words[0] is first.words[0]
+    first.set_text("new text")
+    assert first.words == ("new", "text")
+
+
+def test_set_attribute_marks_style_dirty():
+    root = HTMLParser(add_implicit_tags("<p>hello</p>")).parse()
+    p = get_body(root).children[0]
+    p.style_dirty = False
+    p.set_attribute("Style", "color:red;")
+    assert p.attributes["style"] == "color:red;"
+    assert p.style_dirty and p.layout_dirty
+
+
+def test_insert_and_remove_child():
+    root = HTMLParser(add_implicit_tags("<p>hello</p>")).parse()
+    body = get_body(root)
+    div = Element("div", {})
+    body.insert_child(0, div)
+    assert body.children[0] is div and div.parent is body
+    assert div.style_dirty and body.layout_dirty
+    body.remove_child(div)
+    assert div not in body.children and div.parent is None
+
+
+def test_insert_child_moves_node():
+    root = HTMLParser(add_implicit_tags("<p>hello</p><div></div>")).parse()
+    p, div = get_body(root).children
+    text = p.children[0]
+    div.append_child(text)
+    assert p.children == [] and div.children == [text]
+    assert text.parent is div
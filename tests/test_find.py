@@ -0,0 +1,148 @@
+import time
+
+from benchmarks.fonts import StubBrowser
+from src.css import default_style_sheet
+from src.find import Search, TextIndex, normalize
+from src.loader import load_page
+from tests.test_tab import FakeCanvas, HeadlessBrowser, page_url
+
+
+def index_of(html, width=800):
+    page = load_page(f"data:text/html,{html}", default_style_sheet(), StubBrowser(width))
+    return TextIndex(page.display_list)
+
+
+class RecordingCanvas(FakeCanvas):
+    def __init__(self) -> None:
+        super().__init__()
+        self.rects = []
+
+    def delete(self, tag):
+        super().delete(tag)
+        self.rects = []
+
+    def create_rectangle(self, *args, **kwargs):
+        if "stipple" in kwargs:
+            self.rects.append((args, kwargs["fill"]))
+
+
+def test_normalize():
+    assert normalize("  Hello\n  WORLD ") == "hello world"
+
+
+def test_index_text():
+    index = index_of("<p>The quick <b>Brown</b> fox</p>")
+    assert index.text == "the quick brown fox"
+    assert index.starts == [0, 4, 10, 16]
+    assert index.word_at(12) == 2
+
+
+def test_search_counts_and_cycles():
+    index = index_of("<p>one fish two fish red fish</p>")
+    search = Search(index, "FISH")
+    assert search.count == 3
+    offsets = [search.next() for _ in range(4)]
+    assert offsets == [4, 13, 22, 4]
+    assert search.previous() == 22
+    assert search.previous() == 13
+
+
+def test_search_across_words():
+    index = index_of("<p>red fish <i>blue</i> fish</p>")
+    search = Search(index, "fish   blue")
+    assert search.next() == 4
+    boxes = index.boxes(search.current, len(search.query))
+    assert len(boxes) == 2
+    words = [index.commands[index.word_at(4)], index.commands[index.word_at(9)]]
+    display_list = index.display_list
+    assert boxes[1][0] == display_list.lefts[words[1]]
+    assert boxes[1][2] == display_list.rights[words[1]]
+
+
+def test_partial_word_box():
+    index = index_of("<p>searching</p>")
+    i = index.commands[0]
+    font = index.display_list.fonts.values[index.display_list.font_ids[i]]
+    (x1, _, x2, _), = index.boxes(2, 3)
+    assert x1 == index.display_list.lefts[i] + font.measure("se")
+    assert x2 == index.display_list.lefts[i] + font.measure("searc")
+
+
+def test_narrow_keeps_the_current_match():
+    index = index_of("<p>cat car cart</p>")
+    search = Search(index, "ca")
+    search.next()
+    search.next()
+    assert search.current == 4
+    narrowed = search.narrow("car")
+    assert (narrowed.current, narrowed.count) == (4, 2)
+    narrowed = narrowed.narrow("cart")
+    assert (narrowed.current, narrowed.count) == (8, 1)
+    assert search.narrow("dog").current is None
+
+
+def test_narrow_into_a_new_index_keeps_the_matched_word():
+    search = Search(index_of("<p>hello cat dog cat</p>"), "cat")
+    search.next()
+    assert search.next() == 14
+    # a word above the match got shorter, its text offset moved
+    narrowed = search.narrow("cat", index_of("<p>hi cat dog cat</p>"))
+    assert narrowed.current == 11
+    narrowed = search.narrow("cat", index_of("<p>cat</p>"))
+    assert narrowed.current == 0
+
+
+def test_matches_between():
+    words = " ".join(f"w{i}" for i in range(2000))
+    index = index_of(f"<p>{words} needle</p>")
+    search = Search(index, "needle")
+    bottom = index.display_list.bottoms[index.commands[-1]]
+    assert search.between(0, 100) == []
+    assert search.between(bottom - 1, bottom) == [index.starts[-1]]
+
+
+def test_tab_find_highlights_and_scrolls():
+    browser = HeadlessBrowser(height=100)
+    browser.canvas = RecordingCanvas()
+    tab = browser.new_tab()
+    lines = "".join(f"<p>line {i}</p>" for i in range(100))
+    tab.load(f"data:text/html,{lines}<p>needle here</p>")
+    browser.window.run()
+    assert tab.find("NEEDLE") == 1
+    assert tab.scroll_start > 0
+    (_, y1, _, y2), color = browser.canvas.rects[0]
+    assert 0 <= y1 < y2 <= browser.height
+    assert color == "orange"
+    tab.clear_find()
+    assert browser.canvas.rects == []
+
+
+def test_tab_find_survives_relayout():
+    browser = HeadlessBrowser()
+    browser.canvas = RecordingCanvas()
+    tab = browser.new_tab()
+    tab.load(page_url("find me and me"))
+    browser.window.run()
+    assert tab.find("me") == 2
+    tab.find_next()
+    current = tab.search.current
+    browser.width = 300
+    tab.update()
+    assert tab.search.index.display_list is tab.display_list
+    assert tab.search.current == current
+    assert len(browser.canvas.rects) == 2
+    tab.load(page_url("another page"))
+    browser.window.run()
+    assert tab.search is None
+
+
+def test_typing_on_a_large_page_is_fast():
+    words = " ".join(f"word{i % 5000}" for i in range(200_000))
+    index = index_of(f"<p>{words} needle</p>")
+    search = Search(index, "w")
+    start = time.perf_counter()
+    for query in ["wo", "wor", "word", "word4", "word49", "word499", "needle"]:
+        search = search.narrow(query)
+        search.between(search.index.tops[-1] - 600, search.index.tops[-1])
+    # a frame per keystroke, with lots of slack for slow machines
+    assert (time.perf_counter() - start) / 7 < 0.05
@@ -0,0 +1,100 @@
+from benchmarks.fonts import StubBrowser
+from src.css import default_style_sheet
+from src.display_list import DisplayList
+from src.history import BackForwardCache, History, estimate_size
+from src.loader import load_page
+
+
+def make_page(words=10):
+    html = "<p>" + " ".join(["word"] * words) + "</p>"
+    return load_page(f"data:text/html,{html}", default_style_sheet(), StubBrowser())
+
+
+### history tests
+def test_history_back_and_forward():
+    history = History()
+    assert history.current is None
+    assert not history.can_go_back()
+    a, _ = history.visit("a")
+    b, _ = history.visit("b")
+    assert history.current is b
+    assert history.back() is a
+    assert history.back() is None
+    assert history.forward() is b
+    assert history.forward() is None
+
+
+def test_history_visit_drops_forward_entries():
+    history = History()
+    history.visit("a")
+    b, _ = history.visit("b")
+    c, _ = history.visit("c")
+    history.back()
+    history.back()
+    d, dropped = history.visit("d")
+    assert dropped == [b, c]
+    assert [entry.url for entry in history.entries] == ["a", "d"]
+    assert history.current is d
+    assert not history.can_go_forward()
+
+
+def test_history_entries_are_distinct_visits():
+    history = History()
+    first, _ = history.visit("a")
+    second, _ = history.visit("a")
+    assert first is not second
+    assert first != second
+
+
+### back-forward cache tests
+def test_estimate_size_grows_with_the_page():
+    small, large = make_page(10), make_page(1000)
+    assert estimate_size(large) > estimate_size(small) > 0
+
+
+def test_display_list_nbytes():
+    display_list = DisplayList()
+    empty = display_list.nbytes
+    display_list.add_rect(0, 0, 10, 10, "red")
+    assert display_list.nbytes > empty
+
+
+def test_bfcache_take():
+    history = History()
+    entry, _ = history.visit("a")
+    cache = BackForwardCache()
+    page = make_page()
+    cache.put(entry, page, 120)
+    assert entry in cache
+    assert cache.take(entry) == (page, 120)
+    assert entry not in cache
+    assert cache.take(entry) is None
+    assert cache.size == 0
+
+
+def test_bfcache_capacity_evicts_least_recently_used():
+    history = History()
+    entries = [history.visit(url)[0] for url in "abc"]
+    cache = BackForwardCache(capacity=2)
+    for entry in entries:
+        cache.put(entry, make_page(), 0)
+    assert len(cache) == 2
+    assert entries[0] not in cache
+
+
+def test_bfcache_respects_budget():
+    history = History()
+    entries = [history.visit(url)[0] for url in "abcd"]
+    page = make_page(100)
+    size = estimate_size(page)
+    cache = BackForwardCache(budget=2 * size + 1)
+    for entry in entries[:3]:
+        cache.put(entry, page, 0)
+    assert [entry in cache for entry in entries[:3]] == [False, True, True]
+    assert cache.size == 2 * size
+    # a page bigger than the whole budget is not cached at all
+    cache.put(entries[3], make_page(10000), 0)
+    assert entries[3] not in cache
+    assert len(cache) == 2
+    cache.discard(entries[1])
+    assert cache.size == size
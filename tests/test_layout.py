@@ -0,0 +1,200 @@
+from src.css import INHERITED_PROPERTIES
+from src.display_list import DisplayList
+from src.dom import Element, HTMLParser, Text
+from src.layout import DocumentLayout, LINE_CACHE_SIZE
+from src.tree_utils import tree_to_list
+from src.window import WebFont
+
+
+### utility classes
+class FakeFont:
+    """stands in for a tkinter font, every character is 7px wide"""
+
+    measure_calls = 0
+
+    def measure(self, text):
+        FakeFont.measure_calls += 1
+        return 7 * len(text)
+
+    def metrics(self, option=None):
+        metrics = {"ascent": 10, "descent": 3, "linespace": 13}
+        return metrics[option] if option else metrics
+
+
+class FakeBrowser:
+    def __init__(self, width, height=600):
+        self.width = width
+        self.height = height
+
+    def get_font(self, family, size, weight, slant):
+        return WebFont(FakeFont(), whitespace=7, ascent=10, descent=3, linespace=13)
+
+
+def load(body, width=200):
+    nodes = HTMLParser(f"<html><body>{body}</body></html>").parse()
+    for node in tree_to_list(nodes, []):
+        node.style = dict(INHERITED_PROPERTIES)
+    browser = FakeBrowser(width)
+    document = DocumentLayout(nodes, browser=browser)
+    document.layout()
+    return browser, document
+
+
+def inline_block(document):
+    html = document.children[0]
+    body = html.children[0]
+    return body.children[0]
+
+
+def paint(layout, previous=None):
+    display_list = DisplayList(like=previous)
+    layout.paint(display_list, previous)
+    return display_list
+
+
+def words(layout):
+    return [(cmd.left, cmd.top, cmd.text) for cmd in paint(layout)]
+
+
+### layout tests
+def test_words_wrap_to_width():
+    _, document = load("<p>" + "word " * 50 + "</p>")
+    block = inline_block(document)
+    display_list = paint(block)
+    assert len(display_list) == 50
+    assert max(display_list.rights) <= block.x + block.width
+
+
+def test_br_forces_line_break():
+    _, document = load("<p>hello<br>world</p>")
+    ys = [y for _, y, _ in words(inline_block(document))]
+    assert ys[0] < ys[1]
+
+
+def test_relayout_reuses_layout_tree():
+    _, document = load("<p>hello world</p><p>again</p>")
+    children = list(document.children[0].children)
+    document.layout()
+    assert len(document.children) == 1
+    assert document.children[0].children == children
+
+
+def test_resize_reuses_measured_words():
+    browser, document = load("<p>" + "word " * 50 + "</p>")
+    height = document.height
+    calls = FakeFont.measure_calls
+    browser.width = 400
+    document.layout()
+    assert FakeFont.measure_calls == calls
+    assert document.height < height
+
+
+def test_resize_back_hits_line_cache():
+    browser, document = load("<p>" + "word " * 50 + "</p>")
+    block = inline_block(document)
+    narrow = words(block)
+    browser.width = 400
+    document.layout()
+    cached = block.line_cache[block.width]
+    browser.width = 200
+    document.layout()
+    browser.width = 400
+    document.layout()
+    assert block.line_cache[block.width] is cached
+    browser.width = 200
+    document.layout()
+    assert words(block) == narrow
+
+
+def test_line_cache_is_bounded():
+    browser, document = load("<p>" + "word " * 50 + "</p>")
+    for width in range(200, 200 + 4 * LINE_CACHE_SIZE):
+        browser.width = width
+        document.layout()
+    assert len(inline_block(document).line_cache) == LINE_CACHE_SIZE
+
+
+def test_inline_siblings_of_blocks_share_lines():
+    _, document = load("<div>hello <b>world</b><p>next</p></div>")
+    lines = words(document)
+    assert [text for _, _, text in lines] == ["hello", "world", "next"]
+    assert lines[0][1] == lines[1][1] < lines[2][1]
+
+
+def test_set_text_in_anonymous_block():
+    _, document = load("<div>hello <p>next</p></div>")
+    first = paint(document)
+    document.node.children[0].children[0].children[0].set_text("goodbye world")
+    document.layout()
+    assert [cmd.text for cmd in paint(document, first)] == ["goodbye", "world", "next"]
+
+
+### incremental relayout tests
+def test_clean_relayout_reuses_display_list():
+    _, document = load("<p>hello world</p><p>again</p>")
+    first = paint(document)
+    document.layout()
+    assert not any(block.needs_paint for block in tree_to_list(document.children[0], []))
+    second = paint(document, first)
+    assert list(second.tops) == list(first.tops)
+    assert second.text == first.text
+
+
+def test_set_text_relayouts_only_dirty_block():
+    _, document = load("<div><p>hello</p></div><p>again and again</p>")
+    body = document.children[0].children[0]
+    first = paint(document)
+    calls = FakeFont.measure_calls
+    text = body.node.children[0].children[0].children[0]
+    text.set_text(" ".join(f"word{i}" for i in range(100)))
+    document.layout()
+    # only the changed words are measured again
+    assert FakeFont.measure_calls - calls == 100
+    second = paint(document, first)
+    assert second[-1].text == "again"
+    assert second[-1].top > first[-1].top
+    assert [cmd.text for cmd in second] == [cmd.text for cmd in paint(document)]
+
+
+def test_append_child_builds_new_block():
+    _, document = load("<p>hello</p>")
+    body = document.children[0].children[0]
+    first, = body.children
+    p = Element("p", {})
+    p.append_child(Text("world"))
+    body.node.append_child(p)
+    for node in tree_to_list(p, []):
+        node.style = dict(INHERITED_PROPERTIES)
+    document.layout()
+    assert body.children[0] is first
+    assert [cmd.text for cmd in paint(document)] == ["hello", "world"]
+
+
+def test_remove_child_drops_block():
+    _, document = load("<p>hello</p><p>world</p>")
+    body = document.children[0].children[0]
+    body.node.remove_child(body.node.children[0])
+    document.layout()
+    assert [cmd.text for cmd in paint(document)] == ["world"]
+    assert body.children[0].y == document.y
+
+
+def test_successive_updates_copy_from_the_right_ranges():
+    html = (
+        "<div>intro<p>one <b>two</b> three</p>tail</div>"
+        "<p>four <a href=z>five</a></p><div>hello<p>x</p></div>"
+    )
+    _, document = load(html)
+    display_list = paint(document)
+    body = document.node.children[0]
+    for text, old, new in [
+        (body.children[0].children[1].children[0], "one ", "a b "),
+        (body.children[2].children[0], "hello", "hi there"),
+    ]:
+        text.set_text(new)
+        html = html.replace(old, new)
+        document.layout()
+        display_list = paint(document, display_list)
+        # a fresh paint of the same document would reset its paint ranges
+        _, fresh = load(html)
+        assert [(cmd.left, cmd.top, cmd.text) for cmd in display_list] == words(fresh)
@@ -0,0 +1,116 @@
+from benchmarks.fonts import StubBrowser
+from src.css import default_style_sheet, style
+from src.display_list import DisplayList
+from src.dom import HTMLParser
+from src.layout import DocumentLayout
+from src.layout_cache import LayoutCache, update_keys
+
+
+def lay_out(html, browser):
+    nodes = HTMLParser(html).parse()
+    style(nodes, default_style_sheet())
+    document = DocumentLayout(nodes, browser)
+    document.layout()
+    return document
+
+
+def painted(document):
+    display_list = DisplayList()
+    document.paint(display_list)
+    commands = [dict(vars(cmd)) for cmd in display_list]
+    for cmd in commands:
+        if "font" in cmd:
+            # every browser has its own fonts
+            cmd["font"] = cmd["font"].size
+    return commands, [display_list.link_of(i) for i in range(len(display_list))]
+
+
+def uncached(html, width=800):
+    browser = StubBrowser(width)
+    browser.layout_cache = None
+    return painted(lay_out(html, browser))
+
+
+PAGE = "<div><h1>title</h1><p>some <b>bold</b> words</p></div><p>footer text</p>"
+
+
+def test_reload_hits_the_cache():
+    browser = StubBrowser()
+    first = lay_out(PAGE, browser)
+    stats = browser.layout_cache.stats()
+    assert stats["hits"] == 0 and stats["entries"] > 0
+    second = lay_out(PAGE, browser)
+    stats = browser.layout_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["hit rate"] > 0 and stats["seconds saved"] > 0
+    assert second.height == first.height
+    assert painted(second) == painted(first) == uncached(PAGE)
+
+
+def test_shared_markup_across_pages():
+    header = "<header><p>home about contact</p></header>"
+    browser = StubBrowser()
+    lay_out(f"{header}<p>first page</p>", browser)
+    hits = browser.layout_cache.hits
+    html = f"<p>a longer second page that pushes the header down</p>{header}"
+    document = lay_out(html, browser)
+    assert browser.layout_cache.hits > hits
+    assert painted(document) == uncached(html)
+
+
+def test_key_covers_width_and_links():
+    browser = StubBrowser(300)
+    lay_out("<p>" + "word " * 40 + "</p>", browser)
+    browser.width = 500
+    document = lay_out("<p>" + "word " * 40 + "</p>", browser)
+    assert browser.layout_cache.hits == 0
+    assert painted(document) == uncached("<p>" + "word " * 40 + "</p>", 500)
+    linked = '<a href="/x"><p>text</p></a>'
+    lay_out("<p>text</p>", browser)
+    assert painted(lay_out(linked, browser)) == uncached(linked, 500)
+
+
+def test_styles_change_the_key():
+    plain = HTMLParser("<p>text</p>").parse()
+    bold = HTMLParser('<p style="font-weight:bold">text</p>').parse()
+    for nodes in [plain, bold]:
+        style(nodes, default_style_sheet())
+    assert update_keys(plain) != update_keys(bold)
+
+
+def test_mutations_after_a_hit():
+    browser = StubBrowser()
+    lay_out(PAGE, browser)
+    document = lay_out(PAGE, browser)
+    text = document.node.children[0].children[0].children[0].children[0]
+    text.set_text("new title")
+    document.layout()
+    after = PAGE.replace("title", "new title")
+    assert painted(document) == uncached(after)
+
+
+def test_eviction_is_bounded():
+    cache = LayoutCache(capacity=2)
+    for key in range(5):
+        cache.put(key, object(), 0.01)
+    assert len(cache) == 2
+    assert cache.get(0) is None and cache.get(4) is not None
+    assert cache.stats()["hit rate"] == 0.5
+
+
+def test_anonymous_blocks_key_their_element_styles():
+    html = (
+        '<div style="font-size:300%;color:red">hello<p>x</p></div>'
+        '<div style="color:blue">hello<p>x</p></div><p>below</p>'
+    )
+    assert painted(lay_out(html, StubBrowser())) == uncached(html)
+
+
+def test_restyled_element_of_an_anonymous_block():
+    browser = StubBrowser()
+    document = lay_out("<div>hello<p>x</p></div>", browser)
+    div = document.node.children[0].children[0]
+    div.set_attribute("style", "color:green")
+    style(document.node, default_style_sheet())
+    document.layout()
+    assert painted(document) == uncached('<div style="color:green">hello<p>x</p></div>')
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from src import line_break
+from src.line_break import break_lines, cumulative_widths
+
+
+### utility func
+def reference_lines(widths, spaces, width):
+    """the word at a time loop that break_lines replaces"""
+    lines, xs = [], []
+    line_start, cursor_x = 0, 0
+    for i, (w, space) in enumerate(zip(widths, spaces)):
+        if cursor_x + w > width and i > line_start:
+            lines.append((line_start, i))
+            line_start, cursor_x = i, 0
+        xs.append(cursor_x)
+        cursor_x += w + space
+    if line_start < len(widths):
+        lines.append((line_start, len(widths)))
+    return lines, xs
+
+
+def batched_lines(widths, spaces, width):
+    offsets, right_edges = cumulative_widths(widths, spaces)
+    lines = break_lines(offsets, right_edges, width)
+    xs = [offsets[i] - offsets[start] for start, end in lines for i in range(start, end)]
+    return lines, xs
+
+
+def random_run(seed, n):
+    rng = random.Random(seed)
+    widths = [rng.randint(5, 120) for _ in range(n)]
+    spaces = [rng.choice([4, 5, 7]) for _ in range(n)]
+    return widths, spaces
+
+
+### break_lines tests
+def test_empty_run():
+    assert batched_lines([], [], 100) == ([], [])
+
+
+def test_overflowing_word_gets_its_own_line():
+    lines, xs = batched_lines([50, 300, 50], [5, 5, 5], 100)
+    assert lines == [(0, 1), (1, 2), (2, 3)]
+    assert xs == [0, 0, 0]
+
+
+def test_word_that_exactly_fits_stays_on_line():
+    lines, xs = batched_lines([45, 50], [5, 5], 100)
+    assert lines == [(0, 2)]
+    assert xs == [0, 50]
+
+
+def test_break_lines_within_a_run():
+    offsets, right_edges = cumulative_widths([10] * 6, [0] * 6)
+    assert break_lines(offsets, right_edges, 20, 2, 5) == [(2, 4), (4, 5)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_word_at_a_time_loop(seed, monkeypatch):
+    monkeypatch.setattr(line_break, "np", None)
+    widths, spaces = random_run(seed, 1000)
+    for width in (30, 200, 787):
+        assert batched_lines(widths, spaces, width) == reference_lines(widths, spaces, width)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_numpy_matches_word_at_a_time_loop(seed):
+    pytest.importorskip("numpy")
+    widths, spaces = random_run(seed, 1000)
+    for width in (30, 200, 787):
+        assert batched_lines(widths, spaces, width) == reference_lines(widths, spaces, width)
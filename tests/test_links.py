@@ -0,0 +1,84 @@
+from benchmarks.fonts import StubBrowser
+from benchmarks.loopback import LoopbackServer
+from src.css import default_style_sheet
+from src.display_list import DisplayList
+from src.links import LinkIndex
+from src.loader import load_page
+from tests.test_tab import HeadlessBrowser
+
+
+def display_list_of(html):
+    page = load_page(f"data:text/html,{html}", default_style_sheet(), StubBrowser())
+    return page.display_list
+
+
+def word(display_list, text):
+    i = next(i for i in range(len(display_list)) if display_list.text_of(i) == text)
+    return display_list.lefts[i], display_list.tops[i], display_list.rights[i], display_list.bottoms[i]
+
+
+def test_words_inside_links_carry_the_href():
+    display_list = display_list_of('<p>see <a href="/a.html">this <b>page</b></a> now</p>')
+    links = [display_list.link_of(i) for i in range(len(display_list)) if display_list.kinds[i] == 0]
+    assert links == [None, "/a.html", "/a.html", None]
+
+
+def test_blocks_inside_links():
+    display_list = display_list_of('<a href="x.html"><p>inside</p></a><p>outside</p>')
+    index = LinkIndex(display_list)
+    x1, y1, x2, y2 = word(display_list, "inside")
+    assert index.hit((x1 + x2) / 2, (y1 + y2) / 2) == "x.html"
+    x1, y1, x2, y2 = word(display_list, "outside")
+    assert index.hit((x1 + x2) / 2, (y1 + y2) / 2) is None
+
+
+def test_hit():
+    lines = "".join(f'<p>line <a href="/{i}.html">link{i}</a></p>' for i in range(200))
+    display_list = display_list_of(lines)
+    index = LinkIndex(display_list)
+    assert len(index) == 200
+    for i in [0, 57, 199]:
+        x1, y1, x2, y2 = word(display_list, f"link{i}")
+        assert index.hit(x1, y1) == f"/{i}.html"
+        assert index.hit(x2, y2) == f"/{i}.html"
+        assert index.hit(x1 - 1, y1) is None
+    assert index.hit(0, -10) is None
+
+
+def test_extend_keeps_links():
+    display_list = display_list_of('<p><a href="/a">a</a> b</p>')
+    other = DisplayList()
+    other.extend(display_list)
+    assert [other.link_of(i) for i in range(len(other))] == [
+        display_list.link_of(i) for i in range(len(display_list))
+    ]
+
+
+def test_click_follows_link():
+    browser = HeadlessBrowser()
+    tab = browser.new_tab()
+    target = "data:text/html,target"
+    tab.load(f'data:text/html,<p>go <a href="{target}">there</a></p>')
+    browser.window.run()
+    x1, y1, _, _ = word(tab.display_list, "there")
+    assert tab.click(x1 - 5, y1 - tab.scroll_start + 2) is None
+    assert tab.click(x1 + 1, y1 - tab.scroll_start + 2) == target
+    browser.window.run()
+    assert tab.url == target
+    assert browser.canvas.items == ["target"]
+    assert tab.history.can_go_back()
+
+
+def test_click_during_a_load_resolves_against_the_page_on_screen():
+    pages = {"/dir/a.html": b'<p><a href="b.html">next</a></p>', "/dir/b.html": b"b"}
+    with LoopbackServer(pages) as server:
+        browser = HeadlessBrowser()
+        tab = browser.new_tab()
+        tab.load(server.url("/dir/a.html"))
+        browser.window.run()
+        x1, y1, _, _ = word(tab.display_list, "next")
+        # a navigation starts, the old page stays on screen until it is done
+        tab.load("data:text/html,elsewhere")
+        assert tab.click(x1 + 1, y1 - tab.scroll_start + 2) == server.url("/dir/b.html")
+        browser.window.run()
+        assert browser.canvas.items == ["b"]
@@ -0,0 +1,113 @@
+import time
+
+import pytest
+from benchmarks.fonts import StubBrowser
+from benchmarks.loopback import LoopbackServer
+from src.css import default_style_sheet
+from src.loader import Cancelled, Loader, LoadTask, load_page, stylesheet_links
+from src.dom import HTMLParser
+
+DEFAULT_STYLE_SHEET = default_style_sheet()
+
+
+def wait(loader, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = loader.poll()
+        if result is not None:
+            return result
+        time.sleep(0.005)
+    raise TimeoutError
+
+
+def test_stylesheet_links():
+    nodes = HTMLParser(
+        '<html><head><link rel="stylesheet" href="a.css"><link rel="icon" href="b.png">'
+        '<link rel="stylesheet" href="c.css"></head></html>'
+    ).parse()
+    assert stylesheet_links(nodes) == ["a.css", "c.css"]
+
+
+def test_load_page_file():
+    page = load_page("file://tests/fixtures/complex.html", DEFAULT_STYLE_SHEET, StubBrowser())
+    assert page.width == 800
+    assert page.document.height > 0
+    assert len(page.display_list) > 0
+    # book.css was fetched relative to the page
+    assert len(page.rules) > len(DEFAULT_STYLE_SHEET)
+
+
+def test_load_page_cancelled():
+    task = LoadTask("file://tests/fixtures/simple.html")
+    task.cancel()
+    with pytest.raises(Cancelled):
+        load_page(task.url, DEFAULT_STYLE_SHEET, StubBrowser(), task)
+
+
+def test_loader_runs_on_a_worker():
+    loader = Loader(StubBrowser(), DEFAULT_STYLE_SHEET)
+    task = loader.start("file://tests/fixtures/simple.html")
+    assert loader.loading
+    page, error = wait(loader)
+    assert error is None
+    assert page.url == task.url
+    assert not loader.loading
+    assert task.thread.name == "loader"
+
+
+def test_loader_reports_errors():
+    loader = Loader(StubBrowser(), DEFAULT_STYLE_SHEET)
+    loader.start("file://tests/fixtures/missing.html")
+    page, error = wait(loader)
+    assert page is None
+    assert isinstance(error, FileNotFoundError)
+
+
+def test_loader_new_load_cancels_the_previous_one():
+    pages = {"/slow": b"<p>slow</p>", "/fast": b"<p>fast</p>"}
+    with LoopbackServer(pages, latency=0.2) as server:
+        loader = Loader(StubBrowser(), DEFAULT_STYLE_SHEET)
+        slow = loader.start(server.url("/slow"))
+        fast = loader.start(server.url("/fast"))
+        assert slow.cancelled.is_set()
+        page, error = wait(loader)
+        assert error is None
+        assert page.url == fast.url
+        slow.thread.join()
+        # the cancelled load never hands anything back
+        assert loader.poll() is None
+
+
+def test_load_page_fetches_stylesheets_in_parallel():
+    links = "".join(f'<link rel="stylesheet" href="/{i}.css">' for i in range(4))
+    pages = {"/index.html": f"<html><head>{links}</head><body><p>hi</p></body></html>".encode()}
+    for i in range(4):
+        pages[f"/{i}.css"] = f"p {{ color: c{i}; }}".encode()
+    with LoopbackServer(pages, latency=0.2) as server:
+        start = time.perf_counter()
+        page = load_page(server.url("/index.html"), DEFAULT_STYLE_SHEET, StubBrowser())
+        elapsed = time.perf_counter() - start
+    assert len(page.rules) == len(DEFAULT_STYLE_SHEET) + 4
+    # the page and then all four stylesheets at once, not one after another
+    assert elapsed < 0.2 * 4
+
+
+def test_load_page_resolves_links_after_redirects():
+    pages = {
+        "/dir/index.html": b'<link rel="stylesheet" href="style.css"><p>hi</p>',
+        "/dir/style.css": b"p { color: red; }",
+    }
+    with LoopbackServer(pages, redirects={"/": (302, "/dir/index.html")}) as server:
+        page = load_page(server.url("/"), DEFAULT_STYLE_SHEET, StubBrowser())
+    assert page.url == server.url("/dir/index.html")
+    assert len(page.rules) == len(DEFAULT_STYLE_SHEET) + 1
+
+
+def test_load_page_data_url():
+    # p { color: red; }, base64 so the page's percent decoding leaves it alone
+    css = "data:text/css;base64,cCB7IGNvbG9yOiByZWQ7IH0="
+    page = load_page(
+        f'data:text/html,<link rel="stylesheet" href="{css}"><p>hi</p>', DEFAULT_STYLE_SHEET, StubBrowser()
+    )
+    assert len(page.rules) == len(DEFAULT_STYLE_SHEET) + 1
+    assert page.nodes.children[1].children[0].style["color"] == "red"
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+from src.preload import PreloadScanner, ResourceTable
+
+
+def test_scanner_finds_stylesheets():
+    html = (
+        '<html><head><link rel="stylesheet" href="a.css"><link rel=icon href="b.png">'
+        "<LINK REL=stylesheet HREF=c.css /><linkx rel=stylesheet href=d.css></head>"
+        "<body><p>text</p></body></html>"
+    )
+    assert PreloadScanner().feed(html) == ["a.css", "c.css"]
+
+
+def test_scanner_across_chunks():
+    html = '<p>one</p><link rel="stylesheet" href="a.css"><p>two</p><link rel=stylesheet href=b.css>'
+    for split in range(len(html)):
+        scanner = PreloadScanner()
+        hrefs = scanner.feed(html[:split]) + scanner.feed(html[split:])
+        assert hrefs == ["a.css", "b.css"], split
+
+
+def test_resource_table_fetches_in_parallel():
+    started = threading.Barrier(3, timeout=5)
+
+    def fetch(url):
+        # only returns once all three fetches are running at the same time
+        started.wait()
+        return url.upper()
+
+    with ResourceTable(fetch) as resources:
+        for url in ["a", "b", "c"]:
+            resources.preload(url)
+        assert "a" in resources
+        assert [resources.get(url) for url in ["a", "b", "c"]] == ["A", "B", "C"]
+
+
+def test_resource_table_fetches_once():
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        return url
+
+    with ResourceTable(fetch) as resources:
+        resources.preload("a")
+        resources.preload("a")
+        assert resources.get("a") == "a"
+        # a url the scanner missed is fetched on demand
+        assert resources.get("b") == "b"
+    assert sorted(fetched) == ["a", "b"]
+
+
+def test_resource_table_raises_fetch_errors():
+    def fetch(url):
+        raise FileNotFoundError(url)
+
+    with ResourceTable(fetch) as resources:
+        resources.preload("a")
+        with pytest.raises(FileNotFoundError):
+            resources.get("a")
@@ -0,0 +1,97 @@
+import sys
+import threading
+
+from src.profiling import NULL_PHASE, Profiler
+from src.window import WebFont
+
+
+### utility classes
+class FakeFont:
+    def measure(self, text):
+        return 7 * len(text)
+
+
+### Profiler tests
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    assert profiler.phase("layout") is NULL_PHASE
+    with profiler.phase("layout"):
+        pass
+    profiler.count("nodes", 10)
+    assert profiler.report() == {"phases": {}, "resources": [], "counters": {}}
+
+
+def test_phases_and_counters():
+    profiler = Profiler()
+    profiler.enable()
+    for _ in range(2):
+        with profiler.phase("layout"):
+            pass
+    with profiler.phase("html parse"):
+        pass
+    with profiler.phase("fetch", "http://example.org/"):
+        pass
+    profiler.count("nodes", 10)
+    profiler.count("nodes")
+    report = profiler.report()
+    assert list(report["phases"]) == ["fetch", "html parse", "layout"]
+    assert report["phases"]["layout"]["runs"] == 2
+    assert report["resources"][0]["url"] == "http://example.org/"
+    assert report["counters"] == {"nodes": 11}
+    assert "http://example.org/" in profiler.format_report()
+
+
+def test_phase_records_on_exception():
+    profiler = Profiler()
+    profiler.enable()
+    try:
+        with profiler.phase("fetch", "http://example.org/"):
+            raise ValueError()
+    except ValueError:
+        pass
+    assert profiler.report()["phases"]["fetch"]["runs"] == 1
+
+
+def test_enable_resets_and_disable_keeps_data():
+    profiler = Profiler()
+    profiler.enable()
+    profiler.count("rules", 3)
+    profiler.disable()
+    profiler.count("rules", 3)
+    assert profiler.report()["counters"] == {"rules": 3}
+    profiler.enable()
+    assert profiler.report()["counters"] == {}
+
+
+def test_measure_calls_are_counted(monkeypatch):
+    profiler = Profiler()
+    profiler.enable()
+    monkeypatch.setattr("src.window.PROFILER", profiler)
+    font = WebFont(FakeFont(), whitespace=7)
+    font.measure_all(["a", "b", "a"])
+    font.measure_all(["a", "c"])
+    assert profiler.report()["counters"] == {"font.measure": 3}
+
+
+def test_counts_from_many_threads_add_up():
+    profiler = Profiler()
+    profiler.enable()
+
+    def work():
+        for _ in range(2000):
+            profiler.count("words")
+            profiler.record("layout", 0.5)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        workers = [threading.Thread(target=work) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        sys.setswitchinterval(interval)
+    report = profiler.report()
+    assert report["counters"]["words"] == 16000
+    assert report["phases"]["layout"] == {"seconds": 8000.0, "runs": 16000}
@@ -0,0 +1,165 @@
+import time
+
+from benchmarks.fonts import StubBrowser
+from src.connection import HTTP_CACHE
+from src.css import default_style_sheet
+from src.loader import load_page
+from src.tab import Tab, release_background_renderings
+
+
+class FakeWindow:
+    """collects after() callbacks instead of running an event loop"""
+
+    def __init__(self) -> None:
+        self.callbacks = []
+
+    def after(self, ms, callback):
+        self.callbacks.append(callback)
+
+    def run(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.callbacks and time.monotonic() < deadline:
+            self.callbacks.pop(0)()
+            time.sleep(0.001)
+
+
+class FakeCanvas:
+    def __init__(self) -> None:
+        self.items = []
+
+    def delete(self, tag):
+        self.items = []
+
+    def create_text(self, *args, **kwargs):
+        self.items.append(kwargs["text"])
+
+    def create_rectangle(self, *args, **kwargs):
+        pass
+
+
+class HeadlessBrowser(StubBrowser):
+    """the parts of Browser that a tab uses, without a display"""
+
+    def __init__(self, width=800, height=600) -> None:
+        super().__init__(width, height)
+        self.window = FakeWindow()
+        self.canvas = FakeCanvas()
+        self.active_tab = None
+        self.tabs = []
+
+    def relieve_memory_pressure(self):
+        pass
+
+    def new_tab(self):
+        tab = Tab(self)
+        self.tabs.append(tab)
+        self.active_tab = tab
+        return tab
+
+
+def page_url(text):
+    return f"data:text/html,<p>{text}</p>"
+
+
+def test_tab_loads_and_draws():
+    browser = HeadlessBrowser()
+    tab = browser.new_tab()
+    tab.load(page_url("hello world"))
+    browser.window.run()
+    assert tab.url == page_url("hello world")
+    assert browser.canvas.items == ["hello", "world"]
+
+
+def test_background_tab_does_not_draw():
+    browser = HeadlessBrowser()
+    background = browser.new_tab()
+    browser.new_tab()
+    background.load(page_url("hidden"))
+    browser.window.run()
+    assert background.document is not None
+    assert browser.canvas.items == []
+
+
+def test_tabs_have_their_own_state():
+    browser = HeadlessBrowser()
+    first, second = browser.new_tab(), browser.new_tab()
+    first.show(load_page(page_url("one"), default_style_sheet(), browser))
+    assert second.nodes is None
+    assert second.display_list is not first.display_list
+    assert second.history is not first.history
+
+
+def test_tabs_share_fonts():
+    browser = HeadlessBrowser()
+    first, second = browser.new_tab(), browser.new_tab()
+    first.load(page_url("shared words"))
+    second.load(page_url("shared words"))
+    browser.window.run()
+    fonts = list(browser.fonts.values())
+    assert len(fonts) == 1
+    assert set(fonts[0].widths) == {"shared", "words"}
+
+
+def test_release_and_rebuild_rendering():
+    browser = HeadlessBrowser()
+    tab = browser.new_tab()
+    tab.show(load_page(page_url("some words to lay out"), default_style_sheet(), browser))
+    before = list(tab.display_list)
+    assert tab.rendering_size() > 0
+    tab.release_rendering()
+    assert tab.document is None
+    assert tab.rendering_size() == 0
+    assert tab.nodes is not None
+    tab.activate()
+    assert [vars(cmd) for cmd in tab.display_list] == [vars(cmd) for cmd in before]
+    assert tab.page.document is tab.document
+
+
+def test_release_background_renderings_longest_hidden_first():
+    browser = HeadlessBrowser()
+    tabs = [browser.new_tab() for _ in range(3)]
+    for i, tab in enumerate(tabs):
+        tab.show(load_page(page_url("word " * 200), default_style_sheet(), browser))
+    size = tabs[0].rendering_size()
+    active = tabs[2]
+    release_background_renderings(tabs, active, budget=size)
+    assert tabs[0].document is None
+    assert tabs[1].document is not None
+    release_background_renderings(tabs, active, budget=0)
+    assert tabs[1].document is None
+    assert active.document is not None
+
+
+def test_back_and_forward_use_the_bfcache():
+    browser = HeadlessBrowser()
+    tab = browser.new_tab()
+    tab.load(page_url("first"))
+    browser.window.run()
+    first = tab.document
+    tab.scroll_start = 5
+    tab.load(page_url("second"))
+    browser.window.run()
+    tab.go_back()
+    # straight from the cache, no load
+    assert not browser.window.callbacks
+    assert tab.document is first
+    assert tab.scroll_start == 5
+    assert browser.canvas.items == ["first"]
+    tab.go_forward()
+    assert browser.canvas.items == ["second"]
+
+
+def test_http_cache_is_shared_between_tabs():
+    from benchmarks.loopback import LoopbackServer
+
+    HTTP_CACHE.clear()
+    browser = HeadlessBrowser()
+    first, second = browser.new_tab(), browser.new_tab()
+    with LoopbackServer({"/": b"<p>cached</p>"}, headers={"Cache-Control": "max-age=60"}) as server:
+        first.load(server.url("/"))
+        browser.window.run()
+        second.load(server.url("/"))
+        browser.window.run()
+        assert server.requests == 1
+    assert second.nodes is not first.nodes
+    HTTP_CACHE.clear()
@@ -0,0 +1,95 @@
+import json
+import threading
+
+from src.profiling import Profiler
+from src.tracing import NULL_SPAN, TRACER, Tracer
+
+
+### Tracer tests
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    assert tracer.span("layout") is NULL_SPAN
+    assert tracer.trace_events() == []
+
+
+def test_nested_spans_export(tmp_path):
+    tracer = Tracer()
+    tracer.start()
+    with tracer.span("Browser.load", url="http://example.org/"):
+        with tracer.span("request"):
+            pass
+    tracer.stop()
+    with tracer.span("ignored"):
+        pass
+    path = tmp_path / "trace.json"
+    tracer.export(path)
+    events = json.loads(path.read_text())["traceEvents"]
+    metadata = [event for event in events if event["ph"] == "M"]
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert metadata[0]["args"]["name"] == threading.current_thread().name
+    assert set(spans) == {"Browser.load", "request"}
+    outer, inner = spans["Browser.load"], spans["request"]
+    assert outer["args"] == {"url": "http://example.org/"}
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+
+def test_ring_buffer_keeps_latest_spans():
+    tracer = Tracer(capacity=3)
+    tracer.start()
+    for i in range(5):
+        with tracer.span(f"span {i}"):
+            pass
+    names = [event["name"] for event in tracer.trace_events() if event["ph"] == "X"]
+    assert names == ["span 2", "span 3", "span 4"]
+
+
+def test_worker_threads_get_their_own_track():
+    tracer = Tracer()
+    tracer.start()
+
+    def work():
+        with tracer.span("request"):
+            pass
+
+    worker = threading.Thread(target=work, name="loader")
+    worker.start()
+    worker.join()
+    with tracer.span("draw"):
+        pass
+    events = tracer.trace_events()
+    names = {event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert "loader" in names
+    tids = {event["tid"] for event in events if event["ph"] == "X"}
+    assert len(tids) == 2
+
+
+def test_export_while_new_threads_record():
+    tracer = Tracer()
+    tracer.start()
+
+    def work():
+        with tracer.span("fetch"):
+            pass
+
+    workers = [threading.Thread(target=work, name=f"preload_{i}") for i in range(50)]
+    for worker in workers:
+        worker.start()
+        tracer.trace_events()
+    for worker in workers:
+        worker.join()
+    names = {event["args"]["name"] for event in tracer.trace_events() if event["ph"] == "M"}
+    assert {worker.name for worker in workers} <= names
+
+
+def test_profiler_phases_are_traced():
+    profiler = Profiler()
+    TRACER.start()
+    try:
+        with profiler.phase("fetch", "http://example.org/"):
+            pass
+    finally:
+        TRACER.stop()
+    spans = [event for event in TRACER.trace_events() if event["ph"] == "X"]
+    assert [span["name"] for span in spans] == ["request"]
+    assert profiler.report()["phases"] == {}
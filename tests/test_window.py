@@ -1 +1,67 @@
+import queue
+import threading
+
 import pytest
+
+from benchmarks.fonts import StubFont
+from src.window import Browser
+
+
+class EventWindow:
+    """hands generated events to the thread running its loop"""
+
+    def __init__(self, browser) -> None:
+        self.browser = browser
+        self.events = queue.Queue()
+
+    def event_generate(self, sequence, when=None):
+        self.events.put(sequence)
+
+    def run_while(self, threads):
+        while any(thread.is_alive() for thread in threads):
+            try:
+                self.events.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            self.browser.run_tk_calls()
+
+
+class TkThreadFont(StubFont):
+    def __init__(self, family, size, weight, slant) -> None:
+        super().__init__(size)
+        self.thread = threading.current_thread()
+
+
+@pytest.fixture(name="browser")
+def fixture_browser(monkeypatch):
+    monkeypatch.setattr("src.window.tkfont.Font", TkThreadFont)
+    browser = Browser.__new__(Browser)
+    browser.fonts = {}
+    browser.font_lock = threading.Lock()
+    browser.tk_thread = threading.current_thread()
+    browser.tk_calls = queue.Queue()
+    browser.window = EventWindow(browser)
+    return browser
+
+
+def test_workers_get_fonts_made_on_the_tk_thread(browser):
+    fonts = []
+
+    def worker():
+        fonts.append(browser.get_font("Times", 12, "normal", "roman"))
+        fonts.append(browser.get_font("Times", 12, "normal", "roman"))
+
+    workers = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in workers:
+        thread.start()
+    browser.window.run_while(workers)
+    assert len(browser.fonts) == 1
+    assert all(font is fonts[0] for font in fonts)
+    assert fonts[0].font.thread is threading.current_thread()
+    assert fonts[0].linespace == 16
+
+
+def test_tk_thread_makes_fonts_directly(browser):
+    font = browser.get_font("Times", 12, "bold", "roman")
+    assert browser.tk_calls.empty()
+    assert browser.get_font("Times", 12, "bold", "roman") is font